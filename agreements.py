@@ -0,0 +1,627 @@
+"""
+Helpers for decoding ASSIST agreement files and extracting the requirement
+structure of a single major. Shared by the API server and the indexer.
+"""
+import json
+import re
+from collections import Counter
+
+# Set to False to silence the per-major [DEBUG] output (e.g. when indexing thousands of files)
+DEBUG = True
+
+def _debug(message):
+    if DEBUG:
+        print(f"[DEBUG] {message}")
+
+def normalize_course_code(course_code):
+    """Normalize course codes for comparison (e.g., 'MATH 150' -> 'MATH150')"""
+    if not course_code:
+        return ""
+    # Remove spaces and convert to uppercase
+    normalized = re.sub(r'\s+', '', course_code.upper())
+    return normalized
+
+def build_assist_url(sending_id, receiving_id, year_id):
+    """Build a direct link to the assist.org agreement page.
+    
+    Note: The viewByKey parameter requires an agreement key from assist.org's API
+    which is not available in our JSON data export. Without it, users are taken
+    to the institution pair's agreement page where they can select their major.
+    """
+    # This URL takes users to the agreement page for the institution pair
+    # They can then click on their specific major to view the full agreement
+    return f"https://assist.org/transfer/results?year={year_id}&institution={sending_id}&agreement={receiving_id}&agreementType=to&viewAgreementsOptions=true&view=agreement&viewBy=major&viewSendingAgreements=false"
+
+def split_agreement_key(agreement_key):
+    """Split an agreement key of the form "{filename}_{major_name}" into (filename, major_name)"""
+    # Split on the first "_master.json_" so major names containing underscores stay intact
+    if '_master.json_' not in agreement_key:
+        return None, None
+    filename_part, major_name = agreement_key.split('_master.json_', 1)
+    return filename_part + '_master.json', major_name
+
+# Nested fields of an ASSIST result that are stored as JSON strings
+NESTED_RESULT_FIELDS = ('sendingInstitution', 'receivingInstitution', 'academicYear', 'templateAssets', 'articulations')
+
+def decode_agreement_file(file_path):
+    """Read an agreement file and decode the nested JSON strings inside its result"""
+    with open(file_path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    
+    if isinstance(data, dict) and isinstance(data.get('result'), dict):
+        result = dict(data['result'])
+        for field in NESTED_RESULT_FIELDS:
+            value = result.get(field)
+            if isinstance(value, str):
+                try:
+                    result[field] = json.loads(value)
+                except ValueError as e:
+                    _debug(f"Could not decode {field} in {file_path}: {e}")
+        
+        # Each major carries its own templateAssets, which may also be a JSON string
+        template_assets = result.get('templateAssets')
+        if isinstance(template_assets, list):
+            decoded_assets = []
+            for major in template_assets:
+                if isinstance(major, dict) and isinstance(major.get('templateAssets'), str):
+                    major = dict(major)
+                    try:
+                        major['templateAssets'] = json.loads(major['templateAssets'])
+                    except ValueError:
+                        pass
+                decoded_assets.append(major)
+            result['templateAssets'] = decoded_assets
+        
+        data = dict(data)
+        data['result'] = result
+    
+    return data
+
+def build_agreement_data(data, agreement_key, major_name):
+    """
+    Select one major out of a decoded agreement file (see decode_agreement_file).
+    Returns the agreement_data dict consumed by the extraction helpers, or None.
+    """
+    if isinstance(data, dict) and 'result' in data:
+        result = data['result']
+        
+        # Extract institution IDs and year for assist.org URL
+        sending_id = None
+        receiving_id = None
+        year_id = None
+        try:
+            sending_inst = result.get('sendingInstitution') or {}
+            receiving_inst = result.get('receivingInstitution') or {}
+            academic_year = result.get('academicYear') or {}
+            
+            sending_id = sending_inst.get('id')
+            receiving_id = receiving_inst.get('id')
+            year_id = academic_year.get('id')
+        except Exception as e:
+            _debug(f"Could not parse institution/year data: {e}")
+        
+        # Build assist.org URL
+        assist_url = build_assist_url(sending_id, receiving_id, year_id) if sending_id and receiving_id and year_id else None
+        
+        # templateAssets is already decoded by decode_agreement_file
+        template_assets = result.get('templateAssets')
+        if not isinstance(template_assets, list):
+            template_assets = []
+        
+        # Try exact match first
+        for major in template_assets:
+            if major.get('name') == major_name:
+                # Return the major data along with the full result for context
+                return {
+                    'major_data': major,
+                    'full_result': result,
+                    'agreement_key': agreement_key,
+                    'assist_url': assist_url
+                }
+        
+        # If no exact match, try case-insensitive match
+        major_name_upper = major_name.upper()
+        for major in template_assets:
+            if major.get('name', '').upper() == major_name_upper:
+                return {
+                    'major_data': major,
+                    'full_result': result,
+                    'agreement_key': agreement_key,
+                    'assist_url': assist_url
+                }
+        
+        # If still no match, return the full result anyway (user can browse all majors)
+        _debug(f"Major '{major_name}' not found in templateAssets, returning full result")
+        return {
+            'full_result': result,
+            'agreement_key': agreement_key,
+            'requested_major': major_name,
+            'assist_url': assist_url
+        }
+    elif isinstance(data, list):
+        for item in data:
+            if item.get('key') == agreement_key:
+                return item
+    
+    return None
+
+def get_major_cell_ids(agreement_data):
+    """
+    Get all cell IDs that belong to the selected major's requirement groups.
+    This is needed because a single agreement file contains articulations for ALL majors.
+    """
+    cell_ids = set()
+    
+    if not isinstance(agreement_data, dict):
+        return cell_ids
+    
+    # Try to get the major-specific templateAssets
+    major_data = agreement_data.get('major_data')
+    template_assets = None
+    
+    if major_data and isinstance(major_data, dict):
+        template_assets_raw = major_data.get('templateAssets', [])
+        if isinstance(template_assets_raw, str):
+            try:
+                template_assets = json.loads(template_assets_raw)
+            except:
+                template_assets = []
+        else:
+            template_assets = template_assets_raw
+    
+    if not template_assets:
+        # Fall back to full_result and find the requested major
+        full_result = agreement_data.get('full_result', {})
+        template_assets_str = full_result.get('templateAssets', '[]')
+        
+        try:
+            raw_assets = json.loads(template_assets_str) if isinstance(template_assets_str, str) else template_assets_str
+        except:
+            raw_assets = []
+        
+        if raw_assets and isinstance(raw_assets, list) and raw_assets[0].get('name'):
+            # This is a list of majors
+            requested_major = agreement_data.get('requested_major', '')
+            for major in raw_assets:
+                if major.get('name', '').upper() == requested_major.upper():
+                    template_assets = major.get('templateAssets', [])
+                    break
+            if not template_assets and raw_assets:
+                template_assets = raw_assets[0].get('templateAssets', [])
+        else:
+            template_assets = raw_assets
+    
+    if not template_assets:
+        return cell_ids
+    
+    # Extract all cell IDs from RequirementGroups
+    for asset in template_assets:
+        if asset.get('type') == 'RequirementGroup':
+            for section in asset.get('sections', []):
+                for row in section.get('rows', []):
+                    for cell in row.get('cells', []):
+                        cell_id = cell.get('id', '')
+                        if cell_id:
+                            cell_ids.add(cell_id)
+    
+    return cell_ids
+
+
+def extract_articulation_mappings(agreement_data):
+    """
+    Extract articulation mappings from agreement JSON.
+    Returns a list of mappings: each mapping contains:
+    - receiving_course: The university requirement
+    - sending_courses: List of community college courses that satisfy it
+    - template_cell_id: ID linking to the requirement group
+    
+    IMPORTANT: Only returns articulations for the selected major, not all majors in the file.
+    """
+    mappings = []
+    
+    if not isinstance(agreement_data, dict):
+        return mappings
+    
+    # Get cell IDs for the selected major to filter articulations
+    major_cell_ids = get_major_cell_ids(agreement_data)
+    _debug(f"Major has {len(major_cell_ids)} cell IDs")
+    
+    full_result = agreement_data.get('full_result')
+    
+    if full_result:
+        articulations_str = full_result.get('articulations', '[]')
+        try:
+            articulations = json.loads(articulations_str) if isinstance(articulations_str, str) else articulations_str
+            if isinstance(articulations, list):
+                total_articulations = len(articulations)
+                for articulation in articulations:
+                    art_data = articulation.get('articulation', {})
+                    template_cell_id = articulation.get('templateCellId', '')
+                    
+                    # FILTER: Only include articulations for this major's cells
+                    if major_cell_ids and template_cell_id not in major_cell_ids:
+                        continue
+                    
+                    # Get the receiving university's required course
+                    receiving_course = None
+                    if art_data.get('type') == 'Course':
+                        course = art_data.get('course', {})
+                        prefix = course.get('prefix', '')
+                        course_number = course.get('courseNumber', '')
+                        course_title = course.get('courseTitle', '')
+                        
+                        if prefix and course_number:
+                            receiving_course = {
+                                'course_code': f"{prefix} {course_number}".strip(),
+                                'course_name': course_title or '',
+                                'normalized_code': normalize_course_code(f"{prefix} {course_number}"),
+                                'template_cell_id': template_cell_id
+                            }
+                    elif art_data.get('type') == 'Series':
+                        # Handle series (multiple courses as one requirement)
+                        series = art_data.get('series', {})
+                        series_name = series.get('name', '')
+                        if series_name:
+                            receiving_course = {
+                                'course_code': series_name,
+                                'course_name': 'Course Series',
+                                'normalized_code': normalize_course_code(series_name),
+                                'template_cell_id': template_cell_id,
+                                'is_series': True
+                            }
+                    
+                    # Get the sending community college's equivalent courses
+                    sending_courses = []
+                    sending_articulation = art_data.get('sendingArticulation', {})
+                    items = sending_articulation.get('items', [])
+                    
+                    for item in items:
+                        if item.get('type') == 'CourseGroup':
+                            sub_items = item.get('items', [])
+                            for sub_item in sub_items:
+                                if sub_item.get('type') == 'Course':
+                                    prefix = sub_item.get('prefix', '')
+                                    course_number = sub_item.get('courseNumber', '')
+                                    course_title = sub_item.get('courseTitle', '')
+                                    
+                                    if prefix and course_number:
+                                        sending_courses.append({
+                                            'course_code': f"{prefix} {course_number}".strip(),
+                                            'course_name': course_title or '',
+                                            'normalized_code': normalize_course_code(f"{prefix} {course_number}")
+                                        })
+                        elif item.get('type') == 'Course':
+                            prefix = item.get('prefix', '')
+                            course_number = item.get('courseNumber', '')
+                            course_title = item.get('courseTitle', '')
+                            
+                            if prefix and course_number:
+                                sending_courses.append({
+                                    'course_code': f"{prefix} {course_number}".strip(),
+                                    'course_name': course_title or '',
+                                    'normalized_code': normalize_course_code(f"{prefix} {course_number}")
+                                })
+                    
+                    if receiving_course and sending_courses:
+                        mappings.append({
+                            'receiving_course': receiving_course,
+                            'sending_courses': sending_courses,
+                            'template_cell_id': template_cell_id
+                        })
+                
+                _debug(f"Filtered to {len(mappings)} articulations for this major (from {total_articulations} total)")
+        except Exception as e:
+            _debug(f"Error parsing articulations: {e}")
+    
+    return mappings
+
+
+def infer_subject_from_courses(cells, sections):
+    """
+    Infer a subject name from course prefixes and departments in a requirement group.
+    Returns a human-readable subject name.
+    """
+    # Collect prefixes and departments from courses
+    prefixes = []
+    departments = []
+    
+    for section in sections:
+        rows = section.get('rows', [])
+        for row in rows:
+            row_cells = row.get('cells', [])
+            for cell in row_cells:
+                cell_type = cell.get('type', '')
+                
+                if cell_type == 'Course':
+                    course = cell.get('course', {})
+                    prefix = course.get('prefix', '')
+                    dept = course.get('department', '')
+                    if prefix:
+                        prefixes.append(prefix.upper())
+                    if dept:
+                        departments.append(dept)
+                
+                elif cell_type == 'Series':
+                    series = cell.get('series', {})
+                    for c in series.get('courses', []):
+                        prefix = c.get('prefix', '')
+                        dept = c.get('department', '')
+                        if prefix:
+                            prefixes.append(prefix.upper())
+                        if dept:
+                            departments.append(dept)
+    
+    # Subject mapping from common prefixes
+    prefix_to_subject = {
+        'MATH': 'Mathematics',
+        'MAT': 'Mathematics',
+        'PHYS': 'Physics',
+        'PHY': 'Physics',
+        'CHEM': 'Chemistry',
+        'CHE': 'Chemistry',
+        'BIO': 'Biology',
+        'BIOL': 'Biology',
+        'ECS': 'Computer Science',
+        'CISP': 'Computer Science',
+        'CIS': 'Computer Science',
+        'CS': 'Computer Science',
+        'CSCI': 'Computer Science',
+        'ENG': 'Engineering',
+        'ENGR': 'Engineering',
+        'EEC': 'Electrical Engineering',
+        'ECE': 'Electrical Engineering',
+        'EECS': 'Electrical Engineering & CS',
+        'CMN': 'Communication',
+        'COMM': 'Communication',
+        'SPCH': 'Communication',
+        'ENL': 'English',
+        'ENGL': 'English',
+        'UWP': 'Writing',
+        'COM': 'Comparative Literature',
+        'ACCT': 'Accounting',
+        'MGT': 'Management',
+        'BUS': 'Business',
+        'ECON': 'Economics',
+        'STAT': 'Statistics',
+        'NAS': 'Native American Studies',
+        'HIST': 'History',
+        'PHIL': 'Philosophy',
+        'PSYC': 'Psychology',
+        'SOC': 'Sociology',
+    }
+    
+    # Count prefix occurrences
+    prefix_counts = Counter(prefixes)
+    
+    if prefix_counts:
+        # Get the most common prefix
+        most_common_prefix = prefix_counts.most_common(1)[0][0]
+        
+        # Check if we have a mapping
+        if most_common_prefix in prefix_to_subject:
+            return prefix_to_subject[most_common_prefix]
+        
+        # Try partial matches
+        for prefix_key, subject in prefix_to_subject.items():
+            if most_common_prefix.startswith(prefix_key) or prefix_key.startswith(most_common_prefix):
+                return subject
+    
+    # Fall back to department names
+    if departments:
+        dept_counts = Counter(departments)
+        most_common_dept = dept_counts.most_common(1)[0][0]
+        return most_common_dept
+    
+    return None
+
+
+def extract_requirement_groups(agreement_data):
+    """
+    Extract requirement groups from templateAssets to understand selection rules.
+    Returns a dict mapping group_id to:
+    - instruction_type: 'Following' (all required) or 'NFromArea' (select N)
+    - amount: How many courses/units needed (for NFromArea)
+    - amount_unit_type: 'Course' or 'QuarterUnit' etc.
+    - courses: List of course IDs in this group
+    - title: The section title
+    """
+    groups = {}
+    
+    if not isinstance(agreement_data, dict):
+        return groups
+    
+    # Try to get template assets from major_data first (nested structure)
+    # or from full_result (flat structure like the ASSIST API response)
+    template_assets = None
+    
+    major_data = agreement_data.get('major_data')
+    if major_data and isinstance(major_data, dict):
+        # The file has nested structure: result.templateAssets is a list of majors,
+        # each with their own templateAssets
+        template_assets_raw = major_data.get('templateAssets', [])
+        if isinstance(template_assets_raw, str):
+            try:
+                template_assets = json.loads(template_assets_raw)
+            except:
+                template_assets = []
+        else:
+            template_assets = template_assets_raw
+    
+    if not template_assets:
+        # Fall back to full_result.templateAssets
+        full_result = agreement_data.get('full_result', {})
+        template_assets_str = full_result.get('templateAssets', '[]')
+        
+        try:
+            raw_assets = json.loads(template_assets_str) if isinstance(template_assets_str, str) else template_assets_str
+        except:
+            raw_assets = []
+        
+        if not isinstance(raw_assets, list):
+            return groups
+        
+        # Check if this is a list of majors (nested structure) or direct requirement assets
+        if raw_assets and isinstance(raw_assets[0], dict):
+            first_item = raw_assets[0]
+            if 'name' in first_item and 'templateAssets' in first_item:
+                # This is a list of majors - find the requested major
+                requested_major = agreement_data.get('requested_major', '')
+                for major in raw_assets:
+                    if major.get('name', '').upper() == requested_major.upper():
+                        template_assets = major.get('templateAssets', [])
+                        break
+                
+                # If no match, use the first major's assets
+                if not template_assets and raw_assets:
+                    template_assets = raw_assets[0].get('templateAssets', [])
+            else:
+                # Direct requirement assets (flat structure)
+                template_assets = raw_assets
+    
+    if not template_assets or not isinstance(template_assets, list):
+        _debug("No template assets found for requirement groups")
+        return groups
+    
+    _debug(f"Parsing {len(template_assets)} template assets")
+    
+    # First pass: collect titles by position
+    titles_by_position = {}
+    for asset in template_assets:
+        if asset.get('type') == 'RequirementTitle':
+            position = asset.get('position', 0)
+            content = asset.get('content', '')
+            titles_by_position[position] = content
+    
+    # Second pass: process requirement groups
+    for asset in template_assets:
+        if asset.get('type') != 'RequirementGroup':
+            continue
+        
+        group_id = asset.get('groupId', '')
+        instruction = asset.get('instruction', {})
+        position = asset.get('position', 0)
+        
+        # Find the closest title before this group
+        group_title = ''
+        for pos in sorted(titles_by_position.keys(), reverse=True):
+            if pos <= position:
+                group_title = titles_by_position[pos]
+                break
+        
+        # List of generic/non-subject titles we want to replace
+        generic_titles = [
+            'REQUIRED FOR ADMISSION',
+            'ADDITIONAL MAJOR PREPARATION COURSES',
+            'PREPARATION COURSES FOR THE MAJOR',
+            'HIGHLY RECOMMENDED',
+            'RECOMMENDED',
+            'TECHNICAL ELECTIVES',
+            'REQUIREMENTS',
+            'THE MAJOR PROGRAM',
+            'SELECTIVE MAJOR REQUIREMENTS ADMISSIONS INFORMATION',
+            'TRANSFER ADMISSIONS GUARANTEE (TAG)',
+            'GENERAL INFORMATION',
+        ]
+        
+        # Get sections for subject inference
+        sections = asset.get('sections', [])
+        
+        # If title is generic or empty, try to infer from courses
+        if not group_title or group_title.upper() in [t.upper() for t in generic_titles]:
+            inferred_subject = infer_subject_from_courses([], sections)
+            if inferred_subject:
+                group_title = inferred_subject
+        
+        # Parse instruction type
+        instruction_type = instruction.get('type', 'Following')
+        selection_type = instruction.get('selectionType', 'Complete')
+        amount = instruction.get('amount', 0)
+        amount_unit_type = instruction.get('amountUnitType', 'Course')
+        
+        # Extract course cell IDs from this group, tracking section-level rules
+        course_cell_ids = []
+        section_rules = []  # Track per-section selection rules
+        
+        for section in sections:
+            # Skip non-Section types (like SectionHeader)
+            if section.get('type') != 'Section':
+                continue
+            
+            section_cell_ids = []
+            rows = section.get('rows', [])
+            for row in rows:
+                cells = row.get('cells', [])
+                for cell in cells:
+                    cell_id = cell.get('id', '')
+                    if cell_id:
+                        section_cell_ids.append(cell_id)
+                        course_cell_ids.append(cell_id)
+            
+            # Check section-level advisements for "NFollowing" rules
+            # This handles cases like "Select 1 from: Biology OR Chemistry OR Physics"
+            section_advisements = section.get('advisements', [])
+            section_required = len(section_cell_ids)  # Default: all required
+            section_is_select_n = False
+            
+            for adv in section_advisements:
+                adv_type = adv.get('type', '')
+                if adv_type == 'NFollowing':
+                    adv_amount = adv.get('amount', 0)
+                    adv_unit_type = adv.get('amountUnitType', 'Course')
+                    if adv_unit_type == 'Course':
+                        section_required = int(adv_amount) if adv_amount else len(section_cell_ids)
+                    else:
+                        section_required = max(1, int(adv_amount / 4)) if adv_amount else len(section_cell_ids)
+                    section_is_select_n = True
+                    break
+            
+            if section_cell_ids:
+                section_rules.append({
+                    'cell_ids': section_cell_ids,
+                    'required': section_required,
+                    'total_options': len(section_cell_ids),
+                    'is_select_n': section_is_select_n
+                })
+        
+        # Calculate total required count respecting section-level rules
+        total_required = 0
+        for sec in section_rules:
+            total_required += sec['required']
+        
+        # If no section rules or group-level NFromArea overrides
+        if instruction_type == 'NFromArea' and not any(s.get('is_select_n') for s in section_rules):
+            if amount_unit_type == 'Course':
+                total_required = int(amount) if amount else len(course_cell_ids)
+            else:
+                total_required = max(1, int(amount / 4)) if amount else len(course_cell_ids)
+        elif total_required == 0:
+            total_required = len(course_cell_ids)
+        
+        groups[group_id] = {
+            'instruction_type': instruction_type,
+            'selection_type': selection_type,
+            'amount': amount,
+            'amount_unit_type': amount_unit_type,
+            'course_cell_ids': course_cell_ids,
+            'required_count': total_required,
+            'total_options': len(course_cell_ids),
+            'title': group_title,
+            'attributes': asset.get('attributes', []),
+            'section_rules': section_rules  # Include section-level rules for comparison
+        }
+    
+    _debug(f"Extracted {len(groups)} requirement groups")
+    return groups
+
+
+def compile_major_record(agreement_data):
+    """
+    Pre-digest one major into the structures the comparison needs:
+    cell IDs, flat articulation mappings and requirement groups (with section rules).
+    The record is plain JSON-serializable data so the indexer can store it.
+    """
+    return {
+        'cell_ids': sorted(get_major_cell_ids(agreement_data)),
+        'mappings': extract_articulation_mappings(agreement_data),
+        'requirement_groups': extract_requirement_groups(agreement_data)
+    }
@@ -1,17 +1,51 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, send_file
 from flask_cors import CORS
-from collections import Counter
+from collections import OrderedDict
 import sqlite3
 import json
 import os
 import glob
 import re
 import base64
-import requests
+import gzip
+import hashlib
+import threading
+import time
+import uuid
+from urllib.parse import quote
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
 from dotenv import load_dotenv
+from agreements import (
+    normalize_course_code,
+    split_agreement_key,
+    decode_agreement_file,
+    build_agreement_data,
+    get_major_cell_ids,
+    extract_articulation_mappings,
+    compile_major_record
+)
+from evaluator import RequirementEvaluator
+from openrouter_client import OpenRouterClient, OpenRouterError
+from transcript_parser import parse_transcript, PARSER_VERSION
+from search import (
+    fts_major_query, has_table, fuzzy_major_matches, FUZZY_MAX_RESULTS,
+    InstitutionResolver, institution_alias_rows
+)
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
 
 load_dotenv()
 
+# Set to False to silence the [DEBUG] output (e.g. when cohort_eval imports this module)
+DEBUG = True
+
+def _debug(message):
+    if DEBUG:
+        print(f"[DEBUG] {message}")
+
 app = Flask(__name__)
 CORS(app)
 
@@ -19,55 +53,149 @@ CORS(app)
 DB_NAME = "transfer_data.db"
 DATA_DIR = "assist_data"
 OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
-OPENROUTER_BASE_URL = "https://openrouter.ai/api/v1"
+OPENROUTER_BASE_URL = os.getenv("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1")
 # Using google/gemini-2.0-flash-001 which supports PDF document uploads
 OPENROUTER_MODEL = "google/gemini-2.0-flash-001"
+# Memory budget for the decoded agreement file cache
+AGREEMENT_CACHE_MAX_BYTES = int(os.getenv("AGREEMENT_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+# Decoded agreement files take about this many times their size on disk in memory
+# (nested JSON strings become dicts and lists; measured at ~4.7x)
+AGREEMENT_DECODED_SIZE_FACTOR = 5
+# Per-connection SQLite read tuning
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", 256 * 1024 * 1024))
+SQLITE_CACHE_KIB = int(os.getenv("SQLITE_CACHE_KIB", 64 * 1024))
+# How often (seconds) a thread checks whether the database file was replaced
+SQLITE_REOPEN_CHECK_SECONDS = float(os.getenv("SQLITE_REOPEN_CHECK_SECONDS", 1.0))
+# OpenRouter client: timeouts in seconds, cap on concurrent upstream calls, retries on 429/5xx
+OPENROUTER_CONNECT_TIMEOUT = float(os.getenv("OPENROUTER_CONNECT_TIMEOUT", 5))
+OPENROUTER_READ_TIMEOUT = float(os.getenv("OPENROUTER_READ_TIMEOUT", 120))
+OPENROUTER_MAX_CONCURRENCY = int(os.getenv("OPENROUTER_MAX_CONCURRENCY", 8))
+OPENROUTER_MAX_RETRIES = int(os.getenv("OPENROUTER_MAX_RETRIES", 3))
+# Persistent cache of LLM transcript extractions
+TRANSCRIPT_CACHE_DB = os.getenv("TRANSCRIPT_CACHE_DB", "transcript_cache.db")
+TRANSCRIPT_CACHE_TTL_SECONDS = int(os.getenv("TRANSCRIPT_CACHE_TTL_SECONDS", 30 * 24 * 3600))
+TRANSCRIPT_CACHE_MAX_BYTES = int(os.getenv("TRANSCRIPT_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+# CSV/text transcripts parsed locally with at least this confidence (0-1) skip the model
+LOCAL_PARSE_MIN_CONFIDENCE = float(os.getenv("LOCAL_PARSE_MIN_CONFIDENCE", 0.8))
+# Transcript text longer than this is not sent to the model as text; the original file is sent instead
+TRANSCRIPT_TEXT_MAX_CHARS = int(os.getenv("TRANSCRIPT_TEXT_MAX_CHARS", 100000))
+# Background analysis jobs: worker threads, queue bound (queued + running), and result retention
+ANALYSIS_WORKERS = int(os.getenv("ANALYSIS_WORKERS", 4))
+ANALYSIS_MAX_PENDING = int(os.getenv("ANALYSIS_MAX_PENDING", 32))
+ANALYSIS_RESULT_TTL_SECONDS = int(os.getenv("ANALYSIS_RESULT_TTL_SECONDS", 3600))
+ANALYSIS_MAX_RESULTS = int(os.getenv("ANALYSIS_MAX_RESULTS", 500))
+# Threads shared by all requests for comparing a transcript against agreements (1 = compare inline)
+COMPARISON_WORKERS = int(os.getenv("COMPARISON_WORKERS", min(8, os.cpu_count() or 1)))
+# Response compression: smallest body worth compressing, and gzip level (brotli is used when installed)
+COMPRESSION_MIN_BYTES = int(os.getenv("COMPRESSION_MIN_BYTES", 1024))
+COMPRESSION_LEVEL = int(os.getenv("COMPRESSION_LEVEL", 6))
+# Articulations per page on /api/agreement and /api/file when paging (limit= is capped at the max)
+ARTICULATION_PAGE_SIZE = int(os.getenv("ARTICULATION_PAGE_SIZE", 100))
+ARTICULATION_PAGE_MAX = int(os.getenv("ARTICULATION_PAGE_MAX", 1000))
+# Compiled requirement evaluators kept in memory, one per agreement key
+EVALUATOR_CACHE_SIZE = int(os.getenv("EVALUATOR_CACHE_SIZE", 4096))
+# Most (university, major) targets accepted by one /api/evaluate-batch request
+BATCH_MAX_TARGETS = int(os.getenv("BATCH_MAX_TARGETS", 25))
+# Generated recommendations are reused for identical requests for this long
+RECOMMENDATION_CACHE_TTL_SECONDS = int(os.getenv("RECOMMENDATION_CACHE_TTL_SECONDS", 24 * 3600))
+RECOMMENDATION_CACHE_MAX_ENTRIES = int(os.getenv("RECOMMENDATION_CACHE_MAX_ENTRIES", 10000))
+# GPA and progress are rounded to these steps, so near-identical students share recommendations
+RECOMMENDATION_GPA_STEP = 0.1
+RECOMMENDATION_PROGRESS_STEP = 5
 
-def normalize_course_code(course_code):
-    """Normalize course codes for comparison (e.g., 'MATH 150' -> 'MATH150')"""
-    if not course_code:
-        return ""
-    # Remove spaces and convert to uppercase
-    normalized = re.sub(r'\s+', '', course_code.upper())
-    return normalized
+openrouter = OpenRouterClient(
+    OPENROUTER_BASE_URL,
+    OPENROUTER_API_KEY,
+    connect_timeout=OPENROUTER_CONNECT_TIMEOUT,
+    read_timeout=OPENROUTER_READ_TIMEOUT,
+    max_concurrency=OPENROUTER_MAX_CONCURRENCY,
+    max_retries=OPENROUTER_MAX_RETRIES
+)
 
-def normalize_university_name(name):
-    """Convert common university abbreviations to full names"""
-    name_upper = name.upper()
-    mapping = {
-        'UC BERKELEY': 'University of California, Berkeley',
-        'BERKELEY': 'University of California, Berkeley',
-        'UCLA': 'University of California, Los Angeles',
-        'UC LOS ANGELES': 'University of California, Los Angeles',
-        'UC SAN DIEGO': 'University of California, San Diego',
-        'UCSD': 'University of California, San Diego',
-        'UC IRVINE': 'University of California, Irvine',
-        'UCI': 'University of California, Irvine',
-        'UC DAVIS': 'University of California, Davis',
-        'UCD': 'University of California, Davis',
-        'UC SANTA BARBARA': 'University of California, Santa Barbara',
-        'UCSB': 'University of California, Santa Barbara',
-        'UC RIVERSIDE': 'University of California, Riverside',
-        'UCR': 'University of California, Riverside',
-        'UC SANTA CRUZ': 'University of California, Santa Cruz',
-        'UCSC': 'University of California, Santa Cruz',
-        'UC MERCED': 'University of California, Merced',
-        'UCM': 'University of California, Merced',
-    }
-    
-    for abbrev, full_name in mapping.items():
-        if abbrev in name_upper:
-            return full_name
+# One long-lived read-only connection per worker thread
+_db_local = threading.local()
+
+def get_db():
+    """
+    Return this thread's connection to DB_NAME, opening it on first use.
+    The connection is query-only and reopened if the database file is replaced (checked at
+    most every SQLITE_REOPEN_CHECK_SECONDS). The indexer puts the database in WAL mode.
+    """
+    conn = getattr(_db_local, 'conn', None)
+    now = time.monotonic()
+    if conn is not None and now - _db_local.checked_at < SQLITE_REOPEN_CHECK_SECONDS:
+        return conn
     
-    return name  # Return original if no mapping found
+    try:
+        db_inode = os.stat(DB_NAME).st_ino
+    except FileNotFoundError:
+        # Same error sqlite3.connect gives for a missing database with mode=rw
+        raise sqlite3.OperationalError('unable to open database file')
+    if conn is not None and _db_local.inode == db_inode:
+        _db_local.checked_at = now
+        return conn
+    if conn is not None:
+        conn.close()
+        _db_local.conn = None
+    
+    # mode=rw so a missing database is an error rather than a new empty file
+    conn = sqlite3.connect(f"file:{DB_NAME}?mode=rw", uri=True)
+    conn.execute(f'PRAGMA mmap_size = {SQLITE_MMAP_SIZE}')
+    conn.execute(f'PRAGMA cache_size = -{SQLITE_CACHE_KIB}')
+    conn.execute('PRAGMA query_only = ON')
+    
+    _db_local.conn = conn
+    _db_local.inode = db_inode
+    _db_local.checked_at = now
+    return conn
+
+# Institution resolver built from institution_aliases, reused until the indexer changes catalog_hash
+_institution_resolver = None
+_institution_resolver_version = None
+_institution_resolver_lock = threading.Lock()
+
+def get_institution_resolver():
+    """Return the InstitutionResolver for the current index, rebuilding it after a reindex"""
+    global _institution_resolver, _institution_resolver_version
+    cursor = get_db().cursor()
+    version = None
+    if has_table(cursor, 'catalog_meta'):
+        row = cursor.execute("SELECT value FROM catalog_meta WHERE key = 'catalog_hash'").fetchone()
+        version = row[0] if row else None
+    # Databases indexed before catalogs existed are read once per process
+    version = version or 'legacy'
+    
+    with _institution_resolver_lock:
+        if _institution_resolver is not None and _institution_resolver_version == version:
+            return _institution_resolver
+        
+        if has_table(cursor, 'institution_aliases'):
+            rows = cursor.execute('SELECT alias, kind, institution_id, name, source FROM institution_aliases').fetchall()
+        else:
+            # Indexed before institution_aliases existed: derive the aliases from the agreements
+            cursor.execute("SELECT DISTINCT 'receiving', receiving_id, receiving_name FROM agreements")
+            rows = institution_alias_rows(cursor.fetchall())
+        _institution_resolver = InstitutionResolver(rows)
+        _institution_resolver_version = version
+        _debug(f"Loaded {len(_institution_resolver)} institution aliases")
+        return _institution_resolver
+
+def resolve_university(name):
+    """(receiving_id, canonical name) for a university as typed (e.g. 'UCLA'), or None if unknown or ambiguous"""
+    return get_institution_resolver().resolve(name or '', 'receiving')
+
+def normalize_university_name(name):
+    """Convert common university abbreviations to full names (name unchanged if it can't be resolved)"""
+    resolved = resolve_university(name)
+    return resolved[1] if resolved else name
 
 def search_agreements(target_university, target_major, source_college_id=None):
     """Search for relevant articulation agreements"""
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
+    cursor = get_db().cursor()
     
-    # Normalize university name
-    normalized_uni = normalize_university_name(target_university)
+    # Resolve the university to its id; unresolved names are matched by name instead
+    resolved = resolve_university(target_university)
+    receiving_id, normalized_uni = resolved if resolved else (None, target_university)
     
     # Create flexible major search - handle variations like "Computer Science" matching "COMPUTER SCIENCE, B.S."
     # Split major into words and create a more flexible search
@@ -81,52 +209,75 @@ def search_agreements(target_university, target_major, source_college_id=None):
         major_query_alt = major_query
     
     # Search by receiving university and major (case-insensitive for major)
-    uni_query = f"%{normalized_uni}%"
-    
-    # Try primary search first
-    sql = '''
-        SELECT sending_id, sending_name, receiving_id, receiving_name, major_name, agreement_key
-        FROM agreements
-        WHERE receiving_name LIKE ? AND (UPPER(major_name) LIKE ? OR UPPER(major_name) LIKE ?)
-    '''
-    params = [uni_query, major_query, major_query_alt]
-    
-    if source_college_id:
-        sql += " AND sending_id = ?"
-        params.append(source_college_id)
-    
-    cursor.execute(sql, params)
-    results = cursor.fetchall()
+    if receiving_id is not None:
+        uni_clause, uni_param = "receiving_id = ?", receiving_id
+    else:
+        uni_clause, uni_param = "receiving_name LIKE ?", f"%{normalized_uni}%"
     
-    # If no results, try a more lenient search (just university match)
-    if len(results) == 0:
-        print(f"[DEBUG] No exact matches, trying lenient search...")
+    match_expression = fts_major_query(target_major, None if receiving_id is not None else normalized_uni)
+    if match_expression and has_table(cursor, 'agreements_fts'):
+        # Full-text search: every word of the major as a prefix, ranked by bm25
+        # (major matches weigh more than institution name matches)
         sql = '''
+            SELECT a.sending_id, a.sending_name, a.receiving_id, a.receiving_name, a.major_name, a.agreement_key
+            FROM agreements_fts
+            JOIN agreements a ON a.id = agreements_fts.rowid
+            WHERE agreements_fts MATCH ?
+        '''
+        params = [match_expression]
+        
+        if receiving_id is not None:
+            sql += " AND a.receiving_id = ?"
+            params.append(receiving_id)
+        
+        if source_college_id:
+            sql += " AND a.sending_id = ?"
+            params.append(source_college_id)
+        
+        sql += " ORDER BY bm25(agreements_fts, 10.0, 1.0, 1.0)"
+    else:
+        # Databases indexed before agreements_fts existed
+        sql = f'''
             SELECT sending_id, sending_name, receiving_id, receiving_name, major_name, agreement_key
             FROM agreements
-            WHERE receiving_name LIKE ?
+            WHERE {uni_clause} AND (UPPER(major_name) LIKE ? OR UPPER(major_name) LIKE ?)
         '''
-        params = [uni_query]
+        params = [uni_param, major_query, major_query_alt]
         
         if source_college_id:
             sql += " AND sending_id = ?"
             params.append(source_college_id)
-        
-        cursor.execute(sql, params)
-        all_uni_results = cursor.fetchall()
-        
-        # Filter by major in Python for more flexibility
-        major_upper = target_major.upper()
-        results = [
-            row for row in all_uni_results 
-            if major_upper in row[4].upper() or any(word in row[4].upper() for word in major_words if len(word) > 3)
-        ]
     
-    conn.close()
+    cursor.execute(sql, params)
+    results = cursor.fetchall()
+    
+    scores = {}
     
-    print(f"[DEBUG] Search: '{target_university}' -> '{normalized_uni}', major: '{target_major}' -> found {len(results)} agreements")
+    # If no results, fall back to fuzzy major matching against the precomputed trigram index
+    if len(results) == 0:
+        fuzzy_majors = fuzzy_major_matches(cursor, target_major)
+        _debug(f"No exact matches, fuzzy majors: {fuzzy_majors}")
+        if fuzzy_majors:
+            scores = {major_norm: score for major_norm, score in fuzzy_majors}
+            placeholders = ','.join('?' * len(scores))
+            sql = f'''
+                SELECT sending_id, sending_name, receiving_id, receiving_name, major_name, agreement_key, major_norm
+                FROM agreements
+                WHERE major_norm IN ({placeholders}) AND {uni_clause}
+            '''
+            params = [*scores, uni_param]
+            
+            if source_college_id:
+                sql += " AND sending_id = ?"
+                params.append(source_college_id)
+            
+            cursor.execute(sql, params)
+            # Best-scoring majors first, bounded result set
+            results = sorted(cursor.fetchall(), key=lambda row: -scores[row[6]])[:FUZZY_MAX_RESULTS]
+    
+    _debug(f"Search: '{target_university}' -> '{normalized_uni}' (id {receiving_id}), major: '{target_major}' -> found {len(results)} agreements")
     if results:
-        print(f"[DEBUG] Sample result: {results[0][3]} - {results[0][4]}")
+        _debug(f"Sample result: {results[0][3]} - {results[0][4]}")
     
     # Format results
     return [
@@ -136,590 +287,160 @@ def search_agreements(target_university, target_major, source_college_id=None):
             'receiving_id': row[2],
             'receiving_university': row[3],
             'major': row[4],
-            'agreement_key': row[5]
+            'agreement_key': row[5],
+            # 1.0 for full-text matches, trigram similarity for fuzzy matches
+            'match_score': round(scores[row[6]], 3) if scores else 1.0
         }
         for row in results
     ]
 
-def build_assist_url(sending_id, receiving_id, year_id):
-    """Build a direct link to the assist.org agreement page.
-    
-    Note: The viewByKey parameter requires an agreement key from assist.org's API
-    which is not available in our JSON data export. Without it, users are taken
-    to the institution pair's agreement page where they can select their major.
-    """
-    # This URL takes users to the agreement page for the institution pair
-    # They can then click on their specific major to view the full agreement
-    return f"https://assist.org/transfer/results?year={year_id}&institution={sending_id}&agreement={receiving_id}&agreementType=to&viewAgreementsOptions=true&view=agreement&viewBy=major&viewSendingAgreements=false"
-
-def load_agreement_json(agreement_key):
-    """Load full agreement JSON file by agreement key"""
-    # Agreement key format: "filename_major" (e.g., "51_to_79_master.json_Computer Science, B.A.")
-    files = glob.glob(os.path.join(DATA_DIR, "*_master.json"))
-    
-    # Extract filename and major from agreement_key
-    # The format is: "{filename}_{major_name}"
-    # We need to find the last occurrence of "_master.json_" to split correctly
-    if '_master.json_' in agreement_key:
-        parts = agreement_key.split('_master.json_', 1)
-        if len(parts) == 2:
-            filename_part = parts[0] + '_master.json'
-            major_name = parts[1]
-            
-            # Find matching file
-            for file_path in files:
-                if os.path.basename(file_path) == filename_part:
-                    try:
-                        with open(file_path, 'r', encoding='utf-8') as f:
-                            data = json.load(f)
-                            if isinstance(data, dict) and 'result' in data:
-                                result = data['result']
-                                
-                                # Extract institution IDs and year for assist.org URL
-                                sending_id = None
-                                receiving_id = None
-                                year_id = None
-                                try:
-                                    sending_inst = json.loads(result.get('sendingInstitution', '{}'))
-                                    receiving_inst = json.loads(result.get('receivingInstitution', '{}'))
-                                    academic_year = json.loads(result.get('academicYear', '{}'))
-                                    
-                                    sending_id = sending_inst.get('id')
-                                    receiving_id = receiving_inst.get('id')
-                                    year_id = academic_year.get('id')
-                                except Exception as e:
-                                    print(f"[DEBUG] Could not parse institution/year data: {e}")
-                                
-                                # Build assist.org URL
-                                assist_url = build_assist_url(sending_id, receiving_id, year_id) if sending_id and receiving_id and year_id else None
-                                
-                                # Parse templateAssets to find matching major
-                                template_assets_str = result.get('templateAssets', '[]')
-                                try:
-                                    template_assets = json.loads(template_assets_str) if isinstance(template_assets_str, str) else template_assets_str
-                                except:
-                                    template_assets = []
-                                
-                                # Try exact match first
-                                for major in template_assets:
-                                    if major.get('name') == major_name:
-                                        # Return the major data along with the full result for context
-                                        return {
-                                            'major_data': major,
-                                            'full_result': result,
-                                            'agreement_key': agreement_key,
-                                            'assist_url': assist_url
-                                        }
-                                
-                                # If no exact match, try case-insensitive match
-                                major_name_upper = major_name.upper()
-                                for major in template_assets:
-                                    if major.get('name', '').upper() == major_name_upper:
-                                        return {
-                                            'major_data': major,
-                                            'full_result': result,
-                                            'agreement_key': agreement_key,
-                                            'assist_url': assist_url
-                                        }
-                                
-                                # If still no match, return the full result anyway (user can browse all majors)
-                                print(f"[DEBUG] Major '{major_name}' not found in templateAssets, returning full result")
-                                return {
-                                    'full_result': result,
-                                    'agreement_key': agreement_key,
-                                    'requested_major': major_name,
-                                    'assist_url': assist_url
-                                }
-                            elif isinstance(data, list):
-                                for item in data:
-                                    if item.get('key') == agreement_key:
-                                        return item
-                    except Exception as e:
-                        print(f"[DEBUG] Error loading file {file_path}: {e}")
-                        continue
-    
-    # Fallback: search all files for exact key match
-    for file_path in files:
-        try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                if isinstance(data, list):
-                    for item in data:
-                        if item.get('key') == agreement_key:
-                            return item
-        except Exception as e:
-            continue
-    
-    print(f"[DEBUG] Could not load agreement for key: {agreement_key}")
-    return None
+# In-memory index of agreement files: filename -> path.
+# Rebuilt only when DATA_DIR's mtime changes (files added, removed or renamed).
+_agreement_file_index = {}
+_agreement_file_index_mtime = None
+_agreement_file_index_lock = threading.Lock()
 
-def get_major_cell_ids(agreement_data):
-    """
-    Get all cell IDs that belong to the selected major's requirement groups.
-    This is needed because a single agreement file contains articulations for ALL majors.
-    """
-    cell_ids = set()
-    
-    if not isinstance(agreement_data, dict):
-        return cell_ids
-    
-    # Try to get the major-specific templateAssets
-    major_data = agreement_data.get('major_data')
-    template_assets = None
-    
-    if major_data and isinstance(major_data, dict):
-        template_assets_raw = major_data.get('templateAssets', [])
-        if isinstance(template_assets_raw, str):
-            try:
-                template_assets = json.loads(template_assets_raw)
-            except:
-                template_assets = []
-        else:
-            template_assets = template_assets_raw
-    
-    if not template_assets:
-        # Fall back to full_result and find the requested major
-        full_result = agreement_data.get('full_result', {})
-        template_assets_str = full_result.get('templateAssets', '[]')
-        
-        try:
-            raw_assets = json.loads(template_assets_str) if isinstance(template_assets_str, str) else template_assets_str
-        except:
-            raw_assets = []
-        
-        if raw_assets and isinstance(raw_assets, list) and raw_assets[0].get('name'):
-            # This is a list of majors
-            requested_major = agreement_data.get('requested_major', '')
-            for major in raw_assets:
-                if major.get('name', '').upper() == requested_major.upper():
-                    template_assets = major.get('templateAssets', [])
-                    break
-            if not template_assets and raw_assets:
-                template_assets = raw_assets[0].get('templateAssets', [])
-        else:
-            template_assets = raw_assets
-    
-    if not template_assets:
-        return cell_ids
-    
-    # Extract all cell IDs from RequirementGroups
-    for asset in template_assets:
-        if asset.get('type') == 'RequirementGroup':
-            for section in asset.get('sections', []):
-                for row in section.get('rows', []):
-                    for cell in row.get('cells', []):
-                        cell_id = cell.get('id', '')
-                        if cell_id:
-                            cell_ids.add(cell_id)
-    
-    return cell_ids
+def refresh_agreement_file_index(force=False):
+    """Rescan DATA_DIR if it changed since the last scan and return the filename -> path index"""
+    global _agreement_file_index, _agreement_file_index_mtime
+    try:
+        dir_mtime = os.stat(DATA_DIR).st_mtime_ns
+    except OSError:
+        dir_mtime = None
+    
+    if not force and dir_mtime == _agreement_file_index_mtime:
+        return _agreement_file_index
+    
+    with _agreement_file_index_lock:
+        if force or dir_mtime != _agreement_file_index_mtime:
+            files = glob.glob(os.path.join(DATA_DIR, "*_master.json"))
+            _agreement_file_index = {os.path.basename(path): path for path in files}
+            _agreement_file_index_mtime = dir_mtime
+            _debug(f"Indexed {len(_agreement_file_index)} agreement files in {DATA_DIR}")
+    return _agreement_file_index
 
+def resolve_agreement_file(filename):
+    """Return the path of an agreement file by its basename, or None if it does not exist"""
+    return refresh_agreement_file_index().get(filename)
 
-def extract_articulation_mappings(agreement_data):
+class AgreementFileCache:
     """
-    Extract articulation mappings from agreement JSON.
-    Returns a list of mappings: each mapping contains:
-    - receiving_course: The university requirement
-    - sending_courses: List of community college courses that satisfy it
-    - template_cell_id: ID linking to the requirement group
-    
-    IMPORTANT: Only returns articulations for the selected major, not all majors in the file.
+    LRU cache of decoded agreement files.
+    Entries are keyed on (path, mtime, size) so a rewritten file is decoded again, and their
+    estimated in-memory size (on-disk size x size_factor) is kept under max_bytes.
     """
-    mappings = []
-    
-    if not isinstance(agreement_data, dict):
-        return mappings
     
-    # Get cell IDs for the selected major to filter articulations
-    major_cell_ids = get_major_cell_ids(agreement_data)
-    print(f"[DEBUG] Major has {len(major_cell_ids)} cell IDs")
-    
-    full_result = agreement_data.get('full_result')
-    
-    if full_result:
-        articulations_str = full_result.get('articulations', '[]')
-        try:
-            articulations = json.loads(articulations_str) if isinstance(articulations_str, str) else articulations_str
-            if isinstance(articulations, list):
-                total_articulations = len(articulations)
-                for articulation in articulations:
-                    art_data = articulation.get('articulation', {})
-                    template_cell_id = articulation.get('templateCellId', '')
-                    
-                    # FILTER: Only include articulations for this major's cells
-                    if major_cell_ids and template_cell_id not in major_cell_ids:
-                        continue
-                    
-                    # Get the receiving university's required course
-                    receiving_course = None
-                    if art_data.get('type') == 'Course':
-                        course = art_data.get('course', {})
-                        prefix = course.get('prefix', '')
-                        course_number = course.get('courseNumber', '')
-                        course_title = course.get('courseTitle', '')
-                        
-                        if prefix and course_number:
-                            receiving_course = {
-                                'course_code': f"{prefix} {course_number}".strip(),
-                                'course_name': course_title or '',
-                                'normalized_code': normalize_course_code(f"{prefix} {course_number}"),
-                                'template_cell_id': template_cell_id
-                            }
-                    elif art_data.get('type') == 'Series':
-                        # Handle series (multiple courses as one requirement)
-                        series = art_data.get('series', {})
-                        series_name = series.get('name', '')
-                        if series_name:
-                            receiving_course = {
-                                'course_code': series_name,
-                                'course_name': 'Course Series',
-                                'normalized_code': normalize_course_code(series_name),
-                                'template_cell_id': template_cell_id,
-                                'is_series': True
-                            }
-                    
-                    # Get the sending community college's equivalent courses
-                    sending_courses = []
-                    sending_articulation = art_data.get('sendingArticulation', {})
-                    items = sending_articulation.get('items', [])
-                    
-                    for item in items:
-                        if item.get('type') == 'CourseGroup':
-                            sub_items = item.get('items', [])
-                            for sub_item in sub_items:
-                                if sub_item.get('type') == 'Course':
-                                    prefix = sub_item.get('prefix', '')
-                                    course_number = sub_item.get('courseNumber', '')
-                                    course_title = sub_item.get('courseTitle', '')
-                                    
-                                    if prefix and course_number:
-                                        sending_courses.append({
-                                            'course_code': f"{prefix} {course_number}".strip(),
-                                            'course_name': course_title or '',
-                                            'normalized_code': normalize_course_code(f"{prefix} {course_number}")
-                                        })
-                        elif item.get('type') == 'Course':
-                            prefix = item.get('prefix', '')
-                            course_number = item.get('courseNumber', '')
-                            course_title = item.get('courseTitle', '')
-                            
-                            if prefix and course_number:
-                                sending_courses.append({
-                                    'course_code': f"{prefix} {course_number}".strip(),
-                                    'course_name': course_title or '',
-                                    'normalized_code': normalize_course_code(f"{prefix} {course_number}")
-                                })
-                    
-                    if receiving_course and sending_courses:
-                        mappings.append({
-                            'receiving_course': receiving_course,
-                            'sending_courses': sending_courses,
-                            'template_cell_id': template_cell_id
-                        })
+    def __init__(self, max_bytes, size_factor=AGREEMENT_DECODED_SIZE_FACTOR):
+        self.max_bytes = max_bytes
+        self.size_factor = size_factor
+        self._entries = OrderedDict()  # path -> (mtime_ns, file size, decoded data, estimated bytes)
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    def get(self, file_path):
+        """Return the decoded contents of file_path, reading it only on a miss"""
+        stat = os.stat(file_path)
+        
+        with self._lock:
+            entry = self._entries.get(file_path)
+            if entry and entry[0] == stat.st_mtime_ns and entry[1] == stat.st_size:
+                self._entries.move_to_end(file_path)
+                self.hits += 1
+                return entry[2]
+            self.misses += 1
+        
+        data = decode_agreement_file(file_path)
+        
+        with self._lock:
+            stale = self._entries.pop(file_path, None)
+            if stale:
+                self.current_bytes -= stale[3]
+            
+            estimated_bytes = stat.st_size * self.size_factor
+            if estimated_bytes <= self.max_bytes:
+                self._entries[file_path] = (stat.st_mtime_ns, stat.st_size, data, estimated_bytes)
+                self.current_bytes += estimated_bytes
                 
-                print(f"[DEBUG] Filtered to {len(mappings)} articulations for this major (from {total_articulations} total)")
-        except Exception as e:
-            print(f"[DEBUG] Error parsing articulations: {e}")
-    
-    return mappings
+                # Evict least recently used files until we are back under budget
+                while self.current_bytes > self.max_bytes:
+                    _, (_, _, _, evicted_bytes) = self._entries.popitem(last=False)
+                    self.current_bytes -= evicted_bytes
+                    self.evictions += 1
+        
+        return data
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+    
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self.current_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions
+            }
 
+agreement_file_cache = AgreementFileCache(AGREEMENT_CACHE_MAX_BYTES)
 
-def infer_subject_from_courses(cells, sections):
-    """
-    Infer a subject name from course prefixes and departments in a requirement group.
-    Returns a human-readable subject name.
-    """
-    # Collect prefixes and departments from courses
-    prefixes = []
-    departments = []
-    
-    for section in sections:
-        rows = section.get('rows', [])
-        for row in rows:
-            row_cells = row.get('cells', [])
-            for cell in row_cells:
-                cell_type = cell.get('type', '')
-                
-                if cell_type == 'Course':
-                    course = cell.get('course', {})
-                    prefix = course.get('prefix', '')
-                    dept = course.get('department', '')
-                    if prefix:
-                        prefixes.append(prefix.upper())
-                    if dept:
-                        departments.append(dept)
-                
-                elif cell_type == 'Series':
-                    series = cell.get('series', {})
-                    for c in series.get('courses', []):
-                        prefix = c.get('prefix', '')
-                        dept = c.get('department', '')
-                        if prefix:
-                            prefixes.append(prefix.upper())
-                        if dept:
-                            departments.append(dept)
-    
-    # Subject mapping from common prefixes
-    prefix_to_subject = {
-        'MATH': 'Mathematics',
-        'MAT': 'Mathematics',
-        'PHYS': 'Physics',
-        'PHY': 'Physics',
-        'CHEM': 'Chemistry',
-        'CHE': 'Chemistry',
-        'BIO': 'Biology',
-        'BIOL': 'Biology',
-        'ECS': 'Computer Science',
-        'CISP': 'Computer Science',
-        'CIS': 'Computer Science',
-        'CS': 'Computer Science',
-        'CSCI': 'Computer Science',
-        'ENG': 'Engineering',
-        'ENGR': 'Engineering',
-        'EEC': 'Electrical Engineering',
-        'ECE': 'Electrical Engineering',
-        'EECS': 'Electrical Engineering & CS',
-        'CMN': 'Communication',
-        'COMM': 'Communication',
-        'SPCH': 'Communication',
-        'ENL': 'English',
-        'ENGL': 'English',
-        'UWP': 'Writing',
-        'COM': 'Comparative Literature',
-        'ACCT': 'Accounting',
-        'MGT': 'Management',
-        'BUS': 'Business',
-        'ECON': 'Economics',
-        'STAT': 'Statistics',
-        'NAS': 'Native American Studies',
-        'HIST': 'History',
-        'PHIL': 'Philosophy',
-        'PSYC': 'Psychology',
-        'SOC': 'Sociology',
-    }
+def load_agreement_json(agreement_key):
+    """Load full agreement JSON file by agreement key"""
+    # Agreement key format: "filename_major" (e.g., "51_to_79_master.json_Computer Science, B.A.")
+    filename_part, major_name = split_agreement_key(agreement_key)
+    if not filename_part:
+        _debug(f"Could not load agreement for key: {agreement_key}")
+        return None
     
-    # Count prefix occurrences
-    prefix_counts = Counter(prefixes)
+    file_path = resolve_agreement_file(filename_part)
+    if not file_path:
+        _debug(f"No agreement file {filename_part} for key: {agreement_key}")
+        return None
     
-    if prefix_counts:
-        # Get the most common prefix
-        most_common_prefix = prefix_counts.most_common(1)[0][0]
-        
-        # Check if we have a mapping
-        if most_common_prefix in prefix_to_subject:
-            return prefix_to_subject[most_common_prefix]
-        
-        # Try partial matches
-        for prefix_key, subject in prefix_to_subject.items():
-            if most_common_prefix.startswith(prefix_key) or prefix_key.startswith(most_common_prefix):
-                return subject
+    try:
+        data = agreement_file_cache.get(file_path)
+    except Exception as e:
+        _debug(f"Error loading file {file_path}: {e}")
+        return None
     
-    # Fall back to department names
-    if departments:
-        dept_counts = Counter(departments)
-        most_common_dept = dept_counts.most_common(1)[0][0]
-        return most_common_dept
+    agreement_data = build_agreement_data(data, agreement_key, major_name)
+    if agreement_data:
+        return agreement_data
     
+    _debug(f"Could not load agreement for key: {agreement_key}")
     return None
 
-
-def extract_requirement_groups(agreement_data):
+def load_compiled_major(agreement_data):
     """
-    Extract requirement groups from templateAssets to understand selection rules.
-    Returns a dict mapping group_id to:
-    - instruction_type: 'Following' (all required) or 'NFromArea' (select N)
-    - amount: How many courses/units needed (for NFromArea)
-    - amount_unit_type: 'Course' or 'QuarterUnit' etc.
-    - courses: List of course IDs in this group
-    - title: The section title
+    Return the pre-digested record (cell IDs, mappings, requirement groups) for a major.
+    Uses the copy compiled by indexer.py when it is current for the source file,
+    otherwise compiles it from the agreement data.
     """
-    groups = {}
+    agreement_key = agreement_data.get('agreement_key') if isinstance(agreement_data, dict) else None
     
-    if not isinstance(agreement_data, dict):
-        return groups
-    
-    # Try to get template assets from major_data first (nested structure)
-    # or from full_result (flat structure like the ASSIST API response)
-    template_assets = None
-    
-    major_data = agreement_data.get('major_data')
-    if major_data and isinstance(major_data, dict):
-        # The file has nested structure: result.templateAssets is a list of majors,
-        # each with their own templateAssets
-        template_assets_raw = major_data.get('templateAssets', [])
-        if isinstance(template_assets_raw, str):
+    # Only exact major matches are compiled at index time
+    if agreement_key and agreement_data.get('major_data') and os.path.exists(DB_NAME):
+        filename, _ = split_agreement_key(agreement_key)
+        file_path = resolve_agreement_file(filename) if filename else None
+        if file_path:
             try:
-                template_assets = json.loads(template_assets_raw)
-            except:
-                template_assets = []
-        else:
-            template_assets = template_assets_raw
-    
-    if not template_assets:
-        # Fall back to full_result.templateAssets
-        full_result = agreement_data.get('full_result', {})
-        template_assets_str = full_result.get('templateAssets', '[]')
-        
-        try:
-            raw_assets = json.loads(template_assets_str) if isinstance(template_assets_str, str) else template_assets_str
-        except:
-            raw_assets = []
-        
-        if not isinstance(raw_assets, list):
-            return groups
-        
-        # Check if this is a list of majors (nested structure) or direct requirement assets
-        if raw_assets and isinstance(raw_assets[0], dict):
-            first_item = raw_assets[0]
-            if 'name' in first_item and 'templateAssets' in first_item:
-                # This is a list of majors - find the requested major
-                requested_major = agreement_data.get('requested_major', '')
-                for major in raw_assets:
-                    if major.get('name', '').upper() == requested_major.upper():
-                        template_assets = major.get('templateAssets', [])
-                        break
-                
-                # If no match, use the first major's assets
-                if not template_assets and raw_assets:
-                    template_assets = raw_assets[0].get('templateAssets', [])
-            else:
-                # Direct requirement assets (flat structure)
-                template_assets = raw_assets
-    
-    if not template_assets or not isinstance(template_assets, list):
-        print(f"[DEBUG] No template assets found for requirement groups")
-        return groups
-    
-    print(f"[DEBUG] Parsing {len(template_assets)} template assets")
-    
-    # First pass: collect titles by position
-    titles_by_position = {}
-    for asset in template_assets:
-        if asset.get('type') == 'RequirementTitle':
-            position = asset.get('position', 0)
-            content = asset.get('content', '')
-            titles_by_position[position] = content
-    
-    # Second pass: process requirement groups
-    for asset in template_assets:
-        if asset.get('type') != 'RequirementGroup':
-            continue
-        
-        group_id = asset.get('groupId', '')
-        instruction = asset.get('instruction', {})
-        position = asset.get('position', 0)
-        
-        # Find the closest title before this group
-        group_title = ''
-        for pos in sorted(titles_by_position.keys(), reverse=True):
-            if pos <= position:
-                group_title = titles_by_position[pos]
-                break
-        
-        # List of generic/non-subject titles we want to replace
-        generic_titles = [
-            'REQUIRED FOR ADMISSION',
-            'ADDITIONAL MAJOR PREPARATION COURSES',
-            'PREPARATION COURSES FOR THE MAJOR',
-            'HIGHLY RECOMMENDED',
-            'RECOMMENDED',
-            'TECHNICAL ELECTIVES',
-            'REQUIREMENTS',
-            'THE MAJOR PROGRAM',
-            'SELECTIVE MAJOR REQUIREMENTS ADMISSIONS INFORMATION',
-            'TRANSFER ADMISSIONS GUARANTEE (TAG)',
-            'GENERAL INFORMATION',
-        ]
-        
-        # Get sections for subject inference
-        sections = asset.get('sections', [])
-        
-        # If title is generic or empty, try to infer from courses
-        if not group_title or group_title.upper() in [t.upper() for t in generic_titles]:
-            inferred_subject = infer_subject_from_courses([], sections)
-            if inferred_subject:
-                group_title = inferred_subject
-        
-        # Parse instruction type
-        instruction_type = instruction.get('type', 'Following')
-        selection_type = instruction.get('selectionType', 'Complete')
-        amount = instruction.get('amount', 0)
-        amount_unit_type = instruction.get('amountUnitType', 'Course')
-        
-        # Extract course cell IDs from this group, tracking section-level rules
-        course_cell_ids = []
-        section_rules = []  # Track per-section selection rules
-        
-        for section in sections:
-            # Skip non-Section types (like SectionHeader)
-            if section.get('type') != 'Section':
-                continue
-            
-            section_cell_ids = []
-            rows = section.get('rows', [])
-            for row in rows:
-                cells = row.get('cells', [])
-                for cell in cells:
-                    cell_id = cell.get('id', '')
-                    if cell_id:
-                        section_cell_ids.append(cell_id)
-                        course_cell_ids.append(cell_id)
-            
-            # Check section-level advisements for "NFollowing" rules
-            # This handles cases like "Select 1 from: Biology OR Chemistry OR Physics"
-            section_advisements = section.get('advisements', [])
-            section_required = len(section_cell_ids)  # Default: all required
-            section_is_select_n = False
-            
-            for adv in section_advisements:
-                adv_type = adv.get('type', '')
-                if adv_type == 'NFollowing':
-                    adv_amount = adv.get('amount', 0)
-                    adv_unit_type = adv.get('amountUnitType', 'Course')
-                    if adv_unit_type == 'Course':
-                        section_required = int(adv_amount) if adv_amount else len(section_cell_ids)
-                    else:
-                        section_required = max(1, int(adv_amount / 4)) if adv_amount else len(section_cell_ids)
-                    section_is_select_n = True
-                    break
-            
-            if section_cell_ids:
-                section_rules.append({
-                    'cell_ids': section_cell_ids,
-                    'required': section_required,
-                    'total_options': len(section_cell_ids),
-                    'is_select_n': section_is_select_n
-                })
-        
-        # Calculate total required count respecting section-level rules
-        total_required = 0
-        for sec in section_rules:
-            total_required += sec['required']
-        
-        # If no section rules or group-level NFromArea overrides
-        if instruction_type == 'NFromArea' and not any(s.get('is_select_n') for s in section_rules):
-            if amount_unit_type == 'Course':
-                total_required = int(amount) if amount else len(course_cell_ids)
-            else:
-                total_required = max(1, int(amount / 4)) if amount else len(course_cell_ids)
-        elif total_required == 0:
-            total_required = len(course_cell_ids)
-        
-        groups[group_id] = {
-            'instruction_type': instruction_type,
-            'selection_type': selection_type,
-            'amount': amount,
-            'amount_unit_type': amount_unit_type,
-            'course_cell_ids': course_cell_ids,
-            'required_count': total_required,
-            'total_options': len(course_cell_ids),
-            'title': group_title,
-            'attributes': asset.get('attributes', []),
-            'section_rules': section_rules  # Include section-level rules for comparison
-        }
-    
-    print(f"[DEBUG] Extracted {len(groups)} requirement groups")
-    return groups
+                stat = os.stat(file_path)
+                row = get_db().execute(
+                    'SELECT source_mtime_ns, source_size, record FROM compiled_majors WHERE agreement_key = ?',
+                    (agreement_key,)
+                ).fetchone()
+                if row and row[0] == stat.st_mtime_ns and row[1] == stat.st_size:
+                    return json.loads(row[2])
+            except (OSError, sqlite3.Error) as e:
+                _debug(f"Compiled record unavailable for {agreement_key}: {e}")
+    
+    return compile_major_record(agreement_data)
 
 def extract_courses_from_agreement(agreement_data):
     """Extract required courses and prerequisites from agreement JSON (legacy function)"""
@@ -765,348 +486,77 @@ def extract_courses_from_agreement(agreement_data):
                         else:
                             required_courses.append(course_info)
     
-    print(f"[DEBUG] Extracted {len(required_courses)} required courses, {len(prerequisites)} prerequisites")
+    _debug(f"Extracted {len(required_courses)} required courses, {len(prerequisites)} prerequisites")
     return required_courses, prerequisites
 
+class EvaluatorCache:
+    """
+    LRU cache of RequirementEvaluators per agreement key (i.e. per file and major),
+    invalidated when the agreement file's mtime or size changes.
+    """
+    
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # agreement_key -> ((mtime_ns, size), evaluator)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    def get(self, agreement_data):
+        agreement_key = agreement_data.get('agreement_key') if isinstance(agreement_data, dict) else None
+        
+        # Only exact major selections have a stable identity worth caching
+        stamp = None
+        if agreement_key and agreement_data.get('major_data'):
+            filename, _ = split_agreement_key(agreement_key)
+            file_path = resolve_agreement_file(filename) if filename else None
+            if file_path:
+                try:
+                    stat = os.stat(file_path)
+                    stamp = (stat.st_mtime_ns, stat.st_size)
+                except OSError:
+                    pass
+        
+        if stamp:
+            with self._lock:
+                entry = self._entries.get(agreement_key)
+                if entry and entry[0] == stamp:
+                    self._entries.move_to_end(agreement_key)
+                    self.hits += 1
+                    return entry[1]
+                self.misses += 1
+        
+        evaluator = RequirementEvaluator(load_compiled_major(agreement_data))
+        
+        if stamp:
+            with self._lock:
+                self._entries[agreement_key] = (stamp, evaluator)
+                self._entries.move_to_end(agreement_key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        
+        return evaluator
+    
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses
+            }
+
+evaluator_cache = EvaluatorCache(EVALUATOR_CACHE_SIZE)
+
 def compare_transcript_to_agreement(student_courses, agreement_data):
     """
     Compare student courses against agreement requirements using articulation mappings
     and requirement groups to properly handle 'select N from list' requirements.
     """
-    
-    # Get articulation mappings and requirement groups
-    all_mappings = extract_articulation_mappings(agreement_data)
-    requirement_groups = extract_requirement_groups(agreement_data)
-    
-    # Normalize student courses into a set for quick lookup
-    student_course_set = set()
-    student_course_map = {}
-    for course in student_courses:
-        code = course.get('course_code', '')
-        normalized = normalize_course_code(code)
-        if normalized:
-            student_course_set.add(normalized)
-            student_course_map[normalized] = course
-    
-    print(f"[DEBUG] Student courses normalized: {list(student_course_set)[:10]}...")
-    
-    # Build a mapping from template_cell_id to articulation
-    cell_to_mapping = {}
-    for mapping in all_mappings:
-        cell_id = mapping.get('template_cell_id', '')
-        if cell_id:
-            cell_to_mapping[cell_id] = mapping
-    
-    # Map each course to its group
-    cell_to_group = {}
-    for group_id, group_info in requirement_groups.items():
-        for cell_id in group_info.get('course_cell_ids', []):
-            cell_to_group[cell_id] = group_id
-    
-    # Process each requirement group to determine satisfaction
-    group_results = {}
-    completed_required = []
-    missing_required = []
-    
-    for group_id, group_info in requirement_groups.items():
-        instruction_type = group_info.get('instruction_type', 'Following')
-        required_count = group_info.get('required_count', 0)
-        course_cell_ids = group_info.get('course_cell_ids', [])
-        group_title = group_info.get('title', '')
-        section_rules = group_info.get('section_rules', [])
-        
-        # Build cell_id to completion status map
-        cell_completion_map = {}
-        cell_course_info_map = {}
-        
-        for cell_id in course_cell_ids:
-            mapping = cell_to_mapping.get(cell_id)
-            if not mapping:
-                continue
-            
-            receiving_course = mapping.get('receiving_course', {})
-            sending_courses = mapping.get('sending_courses', [])
-            
-            # Check if student has taken any of the sending courses
-            matched = False
-            matched_student_course = None
-            
-            for sending in sending_courses:
-                sending_normalized = sending.get('normalized_code', '')
-                if sending_normalized in student_course_set:
-                    matched = True
-                    matched_student_course = student_course_map.get(sending_normalized, {})
-                    break
-            
-            course_info = {
-                'course_code': receiving_course.get('course_code', ''),
-                'course_name': receiving_course.get('course_name', ''),
-                'normalized_code': receiving_course.get('normalized_code', ''),
-                'group_id': group_id,
-                'group_title': group_title,
-                'cell_id': cell_id
-            }
-            
-            if matched:
-                course_info['satisfied_by'] = matched_student_course.get('course_code', '') if matched_student_course else ''
-                course_info['student_grade'] = matched_student_course.get('grade', '') if matched_student_course else ''
-                course_info['student_credits'] = matched_student_course.get('credits', 0) if matched_student_course else 0
-                cell_completion_map[cell_id] = True
-            else:
-                cc_options = ', '.join([s.get('course_code', '') for s in sending_courses[:3]])
-                if len(sending_courses) > 3:
-                    cc_options += f" (+{len(sending_courses) - 3} more)"
-                course_info['can_be_satisfied_by'] = cc_options
-                cell_completion_map[cell_id] = False
-            
-            cell_course_info_map[cell_id] = course_info
-        
-        # Process sections with their individual rules
-        completed_in_group = []
-        missing_in_group = []
-        effective_completed = 0
-        effective_required = 0
-        
-        if section_rules:
-            for section in section_rules:
-                section_cell_ids = section.get('cell_ids', [])
-                section_required = section.get('required', len(section_cell_ids))
-                is_select_n = section.get('is_select_n', False)
-                
-                # Count completions in this section
-                section_completed = []
-                section_missing = []
-                
-                for cid in section_cell_ids:
-                    course_info = cell_course_info_map.get(cid)
-                    if not course_info:
-                        continue
-                    if cell_completion_map.get(cid, False):
-                        section_completed.append(course_info)
-                    else:
-                        section_missing.append(course_info)
-                
-                section_completed_count = len(section_completed)
-                
-                if is_select_n:
-                    # "Select N from list" section - cap contributions at required amount
-                    effective_completed += min(section_completed_count, section_required)
-                    effective_required += section_required
-                    
-                    # Add completed courses
-                    completed_in_group.extend(section_completed[:section_required])
-                    
-                    # For missing: only show what's needed, as a choice
-                    if section_completed_count < section_required:
-                        needed = section_required - section_completed_count
-                        # Create a "Select N" entry showing options
-                        if section_missing:
-                            alternatives = [m.get('course_name', m.get('course_code', '')) for m in section_missing[:5]]
-                            choice_entry = {
-                                'course_code': f"Select {needed}",
-                                'course_name': ' OR '.join(alternatives) + ('...' if len(section_missing) > 5 else ''),
-                                'is_choice': True,
-                                'choice_count': needed,
-                                'alternatives': section_missing,
-                                'group_id': group_id,
-                                'group_title': group_title
-                            }
-                            missing_in_group.append(choice_entry)
-                else:
-                    # All required section
-                    effective_completed += section_completed_count
-                    effective_required += section_required
-                    completed_in_group.extend(section_completed)
-                    missing_in_group.extend(section_missing)
-        else:
-            # No section rules - simple processing (fallback)
-            for cid, completed in cell_completion_map.items():
-                course_info = cell_course_info_map.get(cid)
-                if not course_info:
-                    continue
-                if completed:
-                    completed_in_group.append(course_info)
-                else:
-                    missing_in_group.append(course_info)
-            
-            effective_completed = len(completed_in_group)
-            effective_required = required_count
-        
-        # Determine group satisfaction
-        if effective_required > 0:
-            group_satisfied = effective_completed >= effective_required
-        else:
-            group_satisfied = True
-        
-        remaining_needed = max(0, effective_required - effective_completed)
-        
-        # Check if any section has select-N rules
-        has_select_n = any(s.get('is_select_n', False) for s in section_rules) if section_rules else False
-        display_instruction = 'NFromArea' if has_select_n or instruction_type == 'NFromArea' else instruction_type
-        
-        group_results[group_id] = {
-            'title': group_title,
-            'instruction_type': display_instruction,
-            'required_count': effective_required,
-            'total_options': len(course_cell_ids),
-            'completed_count': effective_completed,
-            'satisfied': group_satisfied,
-            'remaining_needed': remaining_needed,
-            'completed_courses': completed_in_group,
-            'missing_courses': missing_in_group
-        }
-        
-        # Add to overall completed/missing lists
-        completed_required.extend(completed_in_group)
-        
-        # For groups with select-N sections, missing_in_group already contains the choice entries
-        # So we just add them directly
-        missing_required.extend(missing_in_group)
-    
-    # Handle any articulations not in a known group (fallback)
-    ungrouped_completed = []
-    ungrouped_missing = []
-    
-    for mapping in all_mappings:
-        cell_id = mapping.get('template_cell_id', '')
-        if cell_id and cell_id in cell_to_group:
-            continue  # Already processed in a group
-        
-        receiving_course = mapping.get('receiving_course', {})
-        sending_courses = mapping.get('sending_courses', [])
-        
-        matched = False
-        matched_student_course = None
-        
-        for sending in sending_courses:
-            sending_normalized = sending.get('normalized_code', '')
-            if sending_normalized in student_course_set:
-                matched = True
-                matched_student_course = student_course_map.get(sending_normalized, {})
-                break
-        
-        if matched:
-            ungrouped_completed.append({
-                'course_code': receiving_course.get('course_code', ''),
-                'course_name': receiving_course.get('course_name', ''),
-                'normalized_code': receiving_course.get('normalized_code', ''),
-                'satisfied_by': matched_student_course.get('course_code', '') if matched_student_course else '',
-                'student_grade': matched_student_course.get('grade', '') if matched_student_course else '',
-                'student_credits': matched_student_course.get('credits', 0) if matched_student_course else 0
-            })
-        else:
-            cc_options = ', '.join([s.get('course_code', '') for s in sending_courses[:3]])
-            if len(sending_courses) > 3:
-                cc_options += f" (+{len(sending_courses) - 3} more)"
-            ungrouped_missing.append({
-                'course_code': receiving_course.get('course_code', ''),
-                'course_name': receiving_course.get('course_name', ''),
-                'normalized_code': receiving_course.get('normalized_code', ''),
-                'can_be_satisfied_by': cc_options
-            })
-    
-    completed_required.extend(ungrouped_completed)
-    missing_required.extend(ungrouped_missing)
-    
-    # Deduplicate results by normalized_code
-    seen_completed = set()
-    deduped_completed = []
-    for course in completed_required:
-        key = course.get('normalized_code', '')
-        if key and key not in seen_completed:
-            seen_completed.add(key)
-            deduped_completed.append(course)
-    
-    seen_missing = set()
-    deduped_missing = []
-    for course in missing_required:
-        key = course.get('normalized_code', '')
-        if key and key not in seen_missing:
-            seen_missing.add(key)
-            deduped_missing.append(course)
-    
-    completed_required = deduped_completed
-    missing_required = deduped_missing
-    
-    # Calculate progress at the group level
-    # Use weighted progress: sum of (completed / required) for each group
-    total_groups = len(requirement_groups) if requirement_groups else max(1, len(all_mappings))
-    satisfied_groups = sum(1 for g in group_results.values() if g.get('satisfied', False))
-    
-    # If no groups parsed, fall back to course-level calculation
-    if not requirement_groups:
-        total_required = len(all_mappings)
-        completed_count = len(completed_required)
-        progress_percentage = (completed_count / total_required * 100) if total_required > 0 else 0
-    else:
-        # Calculate weighted progress: average of group completion percentages
-        # This gives partial credit for groups that are partially complete
-        group_progress_sum = 0
-        for g in group_results.values():
-            req = g.get('required_count', 1)
-            completed = g.get('completed_count', 0)
-            if req > 0:
-                group_progress_sum += min(1.0, completed / req)  # Cap at 100% per group
-            else:
-                group_progress_sum += 1.0  # Empty group counts as complete
-        
-        progress_percentage = (group_progress_sum / total_groups * 100) if total_groups > 0 else 0
-    
-    # Also calculate simple course-level progress for comparison
-    course_level_progress = 0
-    total_courses_needed = len(completed_required) + len(missing_required)
-    if total_courses_needed > 0:
-        course_level_progress = round(len(completed_required) / total_courses_needed * 100, 1)
-    
-    print(f"[DEBUG] Group-level progress: {satisfied_groups}/{total_groups} groups satisfied")
-    print(f"[DEBUG] Weighted progress: {round(progress_percentage, 1)}%")
-    print(f"[DEBUG] Course-level: {len(completed_required)} completed, {len(missing_required)} remaining ({course_level_progress}%)")
-    
-    return {
-        'progress_percentage': round(progress_percentage, 1),
-        'course_progress_percentage': course_level_progress,  # Simple X/Y courses
-        'prereq_progress': 100,  # Not tracking separately
-        'completed_required': completed_required,
-        'missing_required': missing_required,
-        'completed_prerequisites': [],
-        'missing_prerequisites': [],
-        'total_required': len(completed_required) + len(missing_required),
-        'total_prerequisites': 0,
-        'group_results': group_results,  # Detailed per-group breakdown
-        'total_groups': total_groups,
-        'satisfied_groups': satisfied_groups
-    }
+    return evaluator_cache.get(agreement_data).evaluate(student_courses)
 
-@app.route('/api/analyze-transcript', methods=['POST'])
-def analyze_transcript():
-    """Analyze transcript and compare against agreements"""
-    try:
-        if 'file' not in request.files:
-            return jsonify({'error': 'No file provided'}), 400
-        
-        file = request.files['file']
-        target_university = request.form.get('university', '')
-        target_major = request.form.get('major', '')
-        
-        if not target_university or not target_major:
-            return jsonify({'error': 'University and major are required'}), 400
-        
-        if not OPENROUTER_API_KEY:
-            return jsonify({'error': 'OpenRouter API key not configured'}), 500
-        
-        # Read file content
-        file_content = file.read()
-        file_name = file.filename
-        
-        # Determine MIME type
-        mime_type = 'application/pdf'
-        if file_name.endswith('.txt'):
-            mime_type = 'text/plain'
-        elif file_name.endswith('.csv'):
-            mime_type = 'text/csv'
-        
-        # Prepare prompt for structured extraction - also extract the college name
-        prompt = """Extract information from this transcript and return ONLY valid JSON with no other text:
+# Prompt for structured extraction - also extract the college name
+TRANSCRIPT_PROMPT = """Extract information from this transcript and return ONLY valid JSON with no other text:
 {
   "college_name": "Name of the community college",
   "courses": [
@@ -1122,6 +572,147 @@ def analyze_transcript():
 
 Extract the college/institution name and ALL courses with their codes, names, credits, and grades.
 Return only the JSON object, no explanations or markdown formatting."""
+
+class TranscriptExtractionError(Exception):
+    """The model call failed or its output could not be parsed"""
+    
+    def __init__(self, message, raw_response=None):
+        super().__init__(message)
+        self.raw_response = raw_response
+
+class TranscriptExtractionCache:
+    """
+    Persistent cache of transcript extractions in SQLite.
+    Keys are content hashes of the uploaded file plus the prompt and model, so re-analyzing
+    the same transcript against another university or major skips the model. Entries expire
+    after ttl_seconds, and the least recently used are evicted past max_bytes.
+    Each thread keeps its own connection; reads run concurrently (WAL) and writes take _write_lock.
+    """
+    
+    def __init__(self, db_path, ttl_seconds, max_bytes):
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self._write_lock = threading.Lock()
+        self._local = threading.local()
+        self._initialized = False
+    
+    def _connect(self):
+        """Return this thread's connection, creating the schema on first use"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            return conn
+        
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        with self._write_lock:
+            if not self._initialized:
+                self._create_schema(conn)
+                self._initialized = True
+        self._local.conn = conn
+        return conn
+    
+    @staticmethod
+    def _create_schema(conn):
+        conn.execute('PRAGMA journal_mode = WAL')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS extractions (
+                cache_key TEXT PRIMARY KEY,
+                payload TEXT,
+                size INTEGER,
+                created_at REAL,
+                last_used_at REAL
+            )
+        ''')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_extractions_last_used ON extractions(last_used_at)')
+        conn.commit()
+    
+    @staticmethod
+    def make_key(file_content):
+        """
+        Cache key for a file: SHA-256 of its bytes, bound to the current prompt, model and local
+        parser version (local parses, and the text sent to the model, come from transcript_parser)
+        """
+        digest = hashlib.sha256()
+        digest.update(hashlib.sha256(file_content).digest())
+        digest.update(hashlib.sha256(TRANSCRIPT_PROMPT.encode('utf-8')).digest())
+        digest.update(OPENROUTER_MODEL.encode('utf-8'))
+        digest.update(f"parser:{PARSER_VERSION}".encode('utf-8'))
+        return digest.hexdigest()
+    
+    def get(self, cache_key):
+        """Return the cached extraction for cache_key, or None if missing or expired"""
+        conn = self._connect()
+        row = conn.execute('SELECT payload, created_at FROM extractions WHERE cache_key = ?', (cache_key,)).fetchone()
+        if not row:
+            return None
+        
+        now = time.time()
+        expired = now - row[1] > self.ttl_seconds
+        with self._write_lock:
+            try:
+                if expired:
+                    conn.execute('DELETE FROM extractions WHERE cache_key = ?', (cache_key,))
+                else:
+                    conn.execute('UPDATE extractions SET last_used_at = ? WHERE cache_key = ?', (now, cache_key))
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+        return None if expired else json.loads(row[0])
+    
+    def put(self, cache_key, extraction):
+        """Store an extraction, then drop expired entries and evict down to max_bytes"""
+        payload = json.dumps(extraction, separators=(',', ':'))
+        now = time.time()
+        conn = self._connect()
+        with self._write_lock:
+            try:
+                conn.execute(
+                    'INSERT OR REPLACE INTO extractions (cache_key, payload, size, created_at, last_used_at) VALUES (?, ?, ?, ?, ?)',
+                    (cache_key, payload, len(payload), now, now)
+                )
+                conn.execute('DELETE FROM extractions WHERE created_at < ?', (now - self.ttl_seconds,))
+                
+                total = conn.execute('SELECT COALESCE(SUM(size), 0) FROM extractions').fetchone()[0]
+                if total > self.max_bytes:
+                    for key, size in conn.execute('SELECT cache_key, size FROM extractions ORDER BY last_used_at').fetchall():
+                        if total <= self.max_bytes:
+                            break
+                        conn.execute('DELETE FROM extractions WHERE cache_key = ?', (key,))
+                        total -= size
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+
+transcript_cache = TranscriptExtractionCache(
+    TRANSCRIPT_CACHE_DB,
+    TRANSCRIPT_CACHE_TTL_SECONDS,
+    TRANSCRIPT_CACHE_MAX_BYTES
+)
+
+def request_transcript_extraction(file_content, file_name, text=None):
+    """
+    Send a transcript to the model and return its parsed {'college_name', 'courses'} output.
+    When the transcript's text is known (text files, PDF text layers) only the text is sent.
+    """
+    if not OPENROUTER_API_KEY:
+        raise TranscriptExtractionError('OpenRouter API key not configured')
+    
+    if text and len(text) <= TRANSCRIPT_TEXT_MAX_CHARS:
+        message_content = [
+            {
+                "type": "text",
+                "text": f"{TRANSCRIPT_PROMPT}\n\nTranscript text:\n{text}"
+            }
+        ]
+    else:
+        # Determine MIME type
+        mime_type = 'application/pdf'
+        if file_name.endswith('.txt'):
+            mime_type = 'text/plain'
+        elif file_name.endswith('.csv'):
+            mime_type = 'text/csv'
         
         # Create base64 encoded file data for OpenRouter
         file_base64 = base64.b64encode(file_content).decode('utf-8')
@@ -1131,7 +722,7 @@ Return only the JSON object, no explanations or markdown formatting."""
         message_content = [
             {
                 "type": "text",
-                "text": prompt
+                "text": TRANSCRIPT_PROMPT
             },
             {
                 "type": "image_url",
@@ -1140,116 +731,560 @@ Return only the JSON object, no explanations or markdown formatting."""
                 }
             }
         ]
-        
-        # Make request to OpenRouter API
-        headers = {
-            "Authorization": f"Bearer {OPENROUTER_API_KEY}",
-            "Content-Type": "application/json",
-            "HTTP-Referer": "http://localhost:5000",
-            "X-Title": "Transcript Analyzer"
+    
+    # Make request to OpenRouter API
+    payload = {
+        "model": OPENROUTER_MODEL,
+        "messages": [
+            {
+                "role": "user",
+                "content": message_content
+            }
+        ]
+    }
+    
+    try:
+        response_data = openrouter.chat_completion(payload, "Transcript Analyzer")
+    except OpenRouterError as e:
+        raise TranscriptExtractionError(f'OpenRouter API error: {e}')
+    
+    response_text = response_data['choices'][0]['message']['content'].strip()
+    
+    # Clean up response (remove markdown code blocks if present)
+    if response_text.startswith('```'):
+        response_text = re.sub(r'^```(?:json)?\s*', '', response_text, flags=re.MULTILINE)
+        response_text = re.sub(r'\s*```\s*$', '', response_text, flags=re.MULTILINE)
+    
+    # Parse JSON
+    try:
+        parsed_data = json.loads(response_text)
+    except json.JSONDecodeError as e:
+        _debug(f"JSON parse error: {e}")
+        _debug(f"Raw response: {response_text[:500]}")
+        raise TranscriptExtractionError(f'Failed to parse course data: {str(e)}', raw_response=response_text)
+    
+    # Handle both old format (list) and new format (dict with college_name and courses)
+    if isinstance(parsed_data, dict):
+        return {
+            'college_name': parsed_data.get('college_name', ''),
+            'courses': parsed_data.get('courses', [])
         }
+    elif isinstance(parsed_data, list):
+        return {'college_name': '', 'courses': parsed_data}
+    return {'college_name': '', 'courses': []}
+
+def extract_transcript(file_content, file_name):
+    """
+    Return (extraction, extraction_id, cached) for an uploaded transcript, where extraction is
+    {'college_name', 'courses'}. Identical uploads are served from transcript_cache.
+    CSV, text and text-layer PDF uploads are parsed locally; when that parse looks unreliable the
+    model gets the extracted text, and only scans and other files are sent to it whole.
+    """
+    extraction_id = TranscriptExtractionCache.make_key(file_content)
+    cached = transcript_cache.get(extraction_id)
+    if cached is not None:
+        _debug(f"Transcript extraction cache hit: {extraction_id[:12]}")
+        return cached, extraction_id, True
+    
+    local = parse_transcript(file_content, file_name)
+    text = None
+    if local:
+        extraction, confidence, text = local
+        if confidence >= LOCAL_PARSE_MIN_CONFIDENCE:
+            _debug(f"Parsed {file_name} locally ({len(extraction['courses'])} courses, confidence {confidence})")
+            transcript_cache.put(extraction_id, extraction)
+            return extraction, extraction_id, False
+        _debug(f"Local parse of {file_name} not confident ({confidence}), sending its text to the model")
+    
+    extraction = request_transcript_extraction(file_content, file_name, text=text)
+    transcript_cache.put(extraction_id, extraction)
+    return extraction, extraction_id, False
+
+def select_student_agreements(target_university, target_major, detected_college):
+    """Search for relevant agreements - prioritize student's college if detected"""
+    all_agreements = search_agreements(target_university, target_major)
+    _debug(f"Found {len(all_agreements)} total agreements for {target_university} - {target_major}")
+    
+    # Filter and prioritize agreements from the detected college
+    if detected_college:
+        # Find agreements from the student's college first
+        college_agreements = [a for a in all_agreements if detected_college.lower() in a.get('sending_name', '').lower()]
         
-        payload = {
-            "model": OPENROUTER_MODEL,
-            "messages": [
-                {
-                    "role": "user",
-                    "content": message_content
-                }
-            ]
-        }
+        # If we found agreements from the student's college, use only those
+        if college_agreements:
+            _debug(f"Filtered to {len(college_agreements)} agreements from {detected_college}")
+            return college_agreements
         
-        api_response = requests.post(
-            f"{OPENROUTER_BASE_URL}/chat/completions",
-            headers=headers,
-            json=payload
-        )
+        # If no exact match, still prioritize similar names
+        _debug(f"No exact college match, using all {len(all_agreements)} agreements")
+    
+    return all_agreements
+
+def compare_agreement(student_courses, agreement, agreement_data=None):
+    """
+    Load one search result's agreement and compare the student against it (None if it can't be loaded).
+    Pass agreement_data when it has already been built from the decoded file.
+    """
+    agreement_key = agreement.get('agreement_key')
+    if not agreement_key:
+        _debug("Skipping agreement - no key")
+        return None
+    
+    if agreement_data is None:
+        agreement_data = load_agreement_json(agreement_key)
+    if not agreement_data:
+        _debug(f"Could not load agreement JSON for key: {agreement_key}")
+        return None
+    
+    _debug(f"Comparing against agreement: {agreement_key}")
+    comparison = compare_transcript_to_agreement(student_courses, agreement_data)
+    _debug(f"Comparison result: {comparison['progress_percentage']}% progress, {len(comparison['completed_required'])}/{comparison['total_required']} courses completed")
+    
+    return {
+        **agreement,
+        'comparison': comparison,
+        'agreement_data': agreement_data
+    }
+
+comparison_pool = ThreadPoolExecutor(max_workers=COMPARISON_WORKERS, thread_name_prefix='compare') if COMPARISON_WORKERS > 1 else None
+
+def group_agreements_by_file(agreements):
+    """Group (index, agreement) pairs by agreement file so each file is decoded once"""
+    groups = OrderedDict()
+    for index, agreement in enumerate(agreements):
+        filename, _ = split_agreement_key(agreement.get('agreement_key') or '')
+        groups.setdefault(filename, []).append((index, agreement))
+    return list(groups.values())
+
+def compare_agreement_group(student_courses, group):
+    """Compare against every agreement of one file; returns [(index, result)] for those that loaded"""
+    filename, _ = split_agreement_key(group[0][1].get('agreement_key') or '')
+    file_path = resolve_agreement_file(filename) if filename else None
+    data = None
+    if file_path:
+        try:
+            data = agreement_file_cache.get(file_path)
+        except Exception as e:
+            _debug(f"Error loading file {file_path}: {e}")
+    
+    results = []
+    for index, agreement in group:
+        agreement_data = None
+        if data is not None:
+            _, major_name = split_agreement_key(agreement['agreement_key'])
+            agreement_data = build_agreement_data(data, agreement['agreement_key'], major_name)
+        result = compare_agreement(student_courses, agreement, agreement_data)
+        if result:
+            results.append((index, result))
+    return results
+
+def iter_agreement_comparisons(student_courses, agreements):
+    """
+    Yield (index into agreements, compare_agreement result) as each agreement file finishes.
+    Files are compared in parallel on comparison_pool; agreements that can't be loaded are skipped.
+    """
+    groups = group_agreements_by_file(agreements)
+    if comparison_pool is None or len(groups) < 2:
+        for group in groups:
+            yield from compare_agreement_group(student_courses, group)
+        return
+    
+    futures = [comparison_pool.submit(compare_agreement_group, student_courses, group) for group in groups]
+    try:
+        for future in as_completed(futures):
+            yield from future.result()
+    finally:
+        # A disconnected stream or failed group shouldn't leave queued work behind
+        for future in futures:
+            future.cancel()
+
+def project_comparison(result, full=False):
+    """
+    Shape one compare_agreement result for a response. Unless full is set, the embedded
+    agreement_data is replaced by its assist_url and a link to fetch it from /api/agreement.
+    """
+    if full:
+        return result
+    
+    result = dict(result)
+    agreement_data = result.pop('agreement_data')
+    result['assist_url'] = agreement_data.get('assist_url')
+    result['agreement_url'] = f"/api/agreement/{quote(result['agreement_key'], safe='')}"
+    return result
+
+def run_transcript_analysis(file_content, file_name, target_university, target_major, full=False):
+    """
+    Extract courses from a transcript and compare them against every matching agreement.
+    Returns the /api/analyze-transcript response body (see project_comparison for full);
+    raises TranscriptExtractionError.
+    """
+    extraction, extraction_id, extraction_cached = extract_transcript(file_content, file_name)
+    student_courses = extraction['courses']
+    detected_college = extraction['college_name']
+    
+    _debug(f"Detected college: {detected_college} (cached extraction: {extraction_cached})")
+    _debug(f"Extracted {len(student_courses)} courses from transcript")
+    if student_courses:
+        _debug(f"Sample courses: {[c.get('course_code') for c in student_courses[:3]]}")
+    
+    agreements = select_student_agreements(target_university, target_major, detected_college)
+    
+    # Compare against each agreement, keeping search order
+    comparisons = sorted(iter_agreement_comparisons(student_courses, agreements), key=lambda item: item[0])
+    comparison_results = [project_comparison(result, full) for _, result in comparisons]
+    
+    return {
+        'student_courses': student_courses,
+        'agreements': comparison_results,
+        'target_university': target_university,
+        'target_major': target_major,
+        'detected_college': detected_college,
+        'extraction_id': extraction_id,
+        'extraction_cached': extraction_cached
+    }
+
+def extraction_error_body(error):
+    """JSON error body for a TranscriptExtractionError"""
+    body = {'error': str(error)}
+    if error.raw_response is not None:
+        body['raw_response'] = error.raw_response
+    return body
+
+def read_analysis_upload():
+    """
+    Validate an analyze-transcript form upload.
+    Returns ((file_content, file_name, university, major, full), None) or (None, error response),
+    where full is set by view=full (form field or query parameter).
+    """
+    if 'file' not in request.files:
+        return None, (jsonify({'error': 'No file provided'}), 400)
+    
+    file = request.files['file']
+    target_university = request.form.get('university', '')
+    target_major = request.form.get('major', '')
+    
+    if not target_university or not target_major:
+        return None, (jsonify({'error': 'University and major are required'}), 400)
+    
+    full = request.values.get('view') == 'full'
+    
+    # Read file content
+    return (file.read(), file.filename, target_university, target_major, full), None
+
+@app.route('/api/analyze-transcript', methods=['POST'])
+def analyze_transcript():
+    """Analyze transcript and compare against agreements"""
+    try:
+        upload, error_response = read_analysis_upload()
+        if error_response:
+            return error_response
+        
+        try:
+            return jsonify(run_transcript_analysis(*upload))
+        except TranscriptExtractionError as e:
+            return jsonify(extraction_error_body(e)), 500
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+def sse_event(event, data):
+    """Format one server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def sse_response(events):
+    """Stream an iterable of sse_event strings as text/event-stream"""
+    return Response(events, mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'  # don't let a proxy buffer the stream
+    })
+
+@app.route('/api/analyze-transcript/stream', methods=['POST'])
+def analyze_transcript_stream():
+    """
+    Streaming variant of /api/analyze-transcript (same form data) using server-sent events:
+    - extraction: student courses, detected college and how many agreements will follow
+    - agreement: one per agreement as soon as its comparison is ready (see project_comparison)
+    - done: agreement keys ranked by progress, best first
+    - error: extraction, the agreement search or a comparison failed (ends the stream)
+    """
+    upload, error_response = read_analysis_upload()
+    if error_response:
+        return error_response
+    file_content, file_name, target_university, target_major, full = upload
+    
+    def generate():
+        try:
+            extraction, extraction_id, extraction_cached = extract_transcript(file_content, file_name)
+        except TranscriptExtractionError as e:
+            yield sse_event('error', extraction_error_body(e))
+            return
+        except Exception as e:
+            yield sse_event('error', {'error': str(e)})
+            return
         
-        if api_response.status_code != 200:
-            error_msg = api_response.json().get('error', {}).get('message', 'Unknown error')
-            return jsonify({'error': f'OpenRouter API error: {error_msg}'}), 500
+        student_courses = extraction['courses']
+        detected_college = extraction['college_name']
+        try:
+            agreements = select_student_agreements(target_university, target_major, detected_college)
+        except Exception as e:
+            yield sse_event('error', {'error': str(e)})
+            return
         
-        response_data = api_response.json()
-        response_text = response_data['choices'][0]['message']['content'].strip()
+        yield sse_event('extraction', {
+            'student_courses': student_courses,
+            'detected_college': detected_college,
+            'extraction_id': extraction_id,
+            'extraction_cached': extraction_cached,
+            'target_university': target_university,
+            'target_major': target_major,
+            'agreement_count': len(agreements)
+        })
         
-        # Clean up response (remove markdown code blocks if present)
-        if response_text.startswith('```'):
-            response_text = re.sub(r'^```(?:json)?\s*', '', response_text, flags=re.MULTILINE)
-            response_text = re.sub(r'\s*```\s*$', '', response_text, flags=re.MULTILINE)
+        progress = []
+        try:
+            for _, result in iter_agreement_comparisons(student_courses, agreements):
+                progress.append((result['comparison']['progress_percentage'], result['agreement_key']))
+                yield sse_event('agreement', project_comparison(result, full))
+        except Exception as e:
+            yield sse_event('error', {'error': str(e)})
+            return
         
-        # Parse JSON
+        progress.sort(key=lambda item: -item[0])
+        yield sse_event('done', {
+            'count': len(progress),
+            'ranking': [agreement_key for _, agreement_key in progress]
+        })
+    
+    return sse_response(generate())
+
+class AnalysisJobQueue:
+    """
+    Runs transcript analyses on a background thread pool so request threads never wait on
+    the model. At most max_pending jobs may be queued or running; finished jobs are kept for
+    result_ttl seconds (and at most max_results of them) for polling.
+    """
+    
+    def __init__(self, workers, max_pending, result_ttl, max_results):
+        self.max_pending = max_pending
+        self.result_ttl = result_ttl
+        self.max_results = max_results
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='analysis')
+        self._jobs = OrderedDict()  # job_id -> job dict, oldest first
+        self._pending = 0
+        self._lock = threading.Lock()
+    
+    def submit(self, fn, *args):
+        """Queue fn(*args); returns the new job id, or None if the queue is full"""
+        with self._lock:
+            self._prune()
+            if self._pending >= self.max_pending:
+                return None
+            self._pending += 1
+            job_id = uuid.uuid4().hex
+            self._jobs[job_id] = {
+                'job_id': job_id,
+                'status': 'queued',
+                'created_at': time.time(),
+                'finished_at': None,
+                'result': None,
+                'error': None
+            }
+        self._executor.submit(self._run, job_id, fn, args)
+        return job_id
+    
+    def _run(self, job_id, fn, args):
+        with self._lock:
+            self._jobs[job_id]['status'] = 'running'
         try:
-            parsed_data = json.loads(response_text)
-            # Handle both old format (list) and new format (dict with college_name and courses)
-            if isinstance(parsed_data, dict):
-                student_courses = parsed_data.get('courses', [])
-                detected_college = parsed_data.get('college_name', '')
-            elif isinstance(parsed_data, list):
-                student_courses = parsed_data
-                detected_college = ''
-            else:
-                student_courses = []
-                detected_college = ''
-            
-            print(f"[DEBUG] Detected college: {detected_college}")
-            print(f"[DEBUG] Extracted {len(student_courses)} courses from transcript")
-            if student_courses:
-                print(f"[DEBUG] Sample courses: {[c.get('course_code') for c in student_courses[:3]]}")
-        except json.JSONDecodeError as e:
-            print(f"[DEBUG] JSON parse error: {e}")
-            print(f"[DEBUG] Raw response: {response_text[:500]}")
-            return jsonify({'error': f'Failed to parse course data: {str(e)}', 'raw_response': response_text}), 500
-        
-        # Search for relevant agreements - prioritize student's college if detected
-        all_agreements = search_agreements(target_university, target_major)
-        print(f"[DEBUG] Found {len(all_agreements)} total agreements for {target_university} - {target_major}")
-        
-        # Filter and prioritize agreements from the detected college
-        if detected_college:
-            # Find agreements from the student's college first
-            college_agreements = [a for a in all_agreements if detected_college.lower() in a.get('sending_name', '').lower()]
-            other_agreements = [a for a in all_agreements if detected_college.lower() not in a.get('sending_name', '').lower()]
-            
-            # If we found agreements from the student's college, use only those
-            if college_agreements:
-                agreements = college_agreements
-                print(f"[DEBUG] Filtered to {len(agreements)} agreements from {detected_college}")
-            else:
-                # If no exact match, still prioritize similar names
-                agreements = all_agreements
-                print(f"[DEBUG] No exact college match, using all {len(agreements)} agreements")
+            result, error, status = fn(*args), None, 'done'
+        except TranscriptExtractionError as e:
+            result, error, status = None, extraction_error_body(e), 'failed'
+        except Exception as e:
+            result, error, status = None, {'error': str(e)}, 'failed'
+        with self._lock:
+            job = self._jobs[job_id]
+            job.update(status=status, result=result, error=error, finished_at=time.time())
+            self._pending -= 1
+    
+    def _prune(self):
+        """Drop expired finished jobs, then the oldest finished ones beyond max_results (lock held)"""
+        now = time.time()
+        finished = [job_id for job_id, job in self._jobs.items() if job['finished_at'] is not None]
+        for job_id in finished:
+            if now - self._jobs[job_id]['finished_at'] > self.result_ttl:
+                del self._jobs[job_id]
+        finished = [job_id for job_id in finished if job_id in self._jobs]
+        for job_id in finished[:max(0, len(finished) - self.max_results)]:
+            del self._jobs[job_id]
+    
+    def get(self, job_id):
+        """Return a copy of the job, or None if it is unknown or expired"""
+        with self._lock:
+            self._prune()
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+    
+    def stats(self):
+        with self._lock:
+            return {
+                'pending': self._pending,
+                'max_pending': self.max_pending,
+                'stored': len(self._jobs)
+            }
+
+analysis_jobs = AnalysisJobQueue(
+    ANALYSIS_WORKERS,
+    ANALYSIS_MAX_PENDING,
+    ANALYSIS_RESULT_TTL_SECONDS,
+    ANALYSIS_MAX_RESULTS
+)
+
+@app.route('/api/analyze-transcript/jobs', methods=['POST'])
+def submit_analysis_job():
+    """Queue a transcript analysis and return its job id right away (202), or 429 if the queue is full"""
+    try:
+        upload, error_response = read_analysis_upload()
+        if error_response:
+            return error_response
+        
+        job_id = analysis_jobs.submit(run_transcript_analysis, *upload)
+        if not job_id:
+            response = jsonify({'error': 'Too many analyses in progress, try again shortly'})
+            response.headers['Retry-After'] = '5'
+            return response, 429
+        
+        status_url = f"/api/analyze-transcript/jobs/{job_id}"
+        response = jsonify({'job_id': job_id, 'status': 'queued', 'status_url': status_url})
+        response.headers['Location'] = status_url
+        return response, 202
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/analyze-transcript/jobs/<job_id>', methods=['GET'])
+def get_analysis_job(job_id):
+    """Poll an analysis job: status is queued, running, done (with result) or failed (with error)"""
+    job = analysis_jobs.get(job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    body = {'job_id': job_id, 'status': job['status']}
+    if job['status'] == 'done':
+        body['result'] = job['result']
+    elif job['status'] == 'failed':
+        body['error'] = job['error']
+    return jsonify(body)
+
+def summarize_comparison(result):
+    """One cell of the batch matrix: an agreement's progress without the course lists"""
+    comparison = result['comparison']
+    return {
+        'agreement_key': result['agreement_key'],
+        'sending_name': result.get('sending_name'),
+        'receiving_university': result.get('receiving_university'),
+        'major': result.get('major'),
+        'progress_percentage': comparison['progress_percentage'],
+        'course_progress_percentage': comparison['course_progress_percentage'],
+        'satisfied_groups': comparison['satisfied_groups'],
+        'total_groups': comparison['total_groups'],
+        'assist_url': result['agreement_data'].get('assist_url'),
+        'agreement_url': f"/api/agreement/{quote(result['agreement_key'], safe='')}"
+    }
+
+@app.route('/api/evaluate-batch', methods=['POST'])
+def evaluate_batch():
+    """
+    Evaluate one student against several (university, major) targets in a single pass.
+    JSON body:
+    - student_courses, or extraction_id from a previous analysis (uses the cached extraction)
+    - targets: [{"university": ..., "major": ...}, ...]
+    - detected_college (optional, defaults to the extraction's college)
+    - include_comparisons (optional): embed each agreement's full comparison
+    Agreements shared by several targets are compared once. Targets are ranked by their best
+    agreement's progress, and each target's agreements are ranked the same way.
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        targets = data.get('targets')
+        if not isinstance(targets, list) or not targets:
+            return jsonify({'error': 'targets must be a non-empty list of {university, major}'}), 400
+        if len(targets) > BATCH_MAX_TARGETS:
+            return jsonify({'error': f'At most {BATCH_MAX_TARGETS} targets per request'}), 400
+        for target in targets:
+            if not isinstance(target, dict) or not target.get('university') or not target.get('major'):
+                return jsonify({'error': 'Each target needs a university and a major'}), 400
+        
+        detected_college = data.get('detected_college')
+        extraction_id = data.get('extraction_id')
+        if 'student_courses' in data:
+            student_courses = data['student_courses']
+            if not isinstance(student_courses, list):
+                return jsonify({'error': 'student_courses must be a list'}), 400
+        elif extraction_id:
+            extraction = transcript_cache.get(extraction_id)
+            if extraction is None:
+                return jsonify({'error': 'Extraction not found or expired, analyze the transcript again'}), 404
+            student_courses = extraction['courses']
+            if detected_college is None:
+                detected_college = extraction['college_name']
         else:
-            agreements = all_agreements
-        
-        # Compare against each agreement
-        comparison_results = []
-        for agreement in agreements:
-            agreement_key = agreement.get('agreement_key')
-            if not agreement_key:
-                print(f"[DEBUG] Skipping agreement - no key")
-                continue
-            
-            agreement_data = load_agreement_json(agreement_key)
-            if not agreement_data:
-                print(f"[DEBUG] Could not load agreement JSON for key: {agreement_key}")
-                continue
-            
-            print(f"[DEBUG] Comparing against agreement: {agreement_key}")
-            comparison = compare_transcript_to_agreement(student_courses, agreement_data)
-            print(f"[DEBUG] Comparison result: {comparison['progress_percentage']}% progress, {len(comparison['completed_required'])}/{comparison['total_required']} courses completed")
+            return jsonify({'error': 'student_courses or extraction_id is required'}), 400
+        
+        include_comparisons = bool(data.get('include_comparisons'))
+        
+        # Gather every target's agreements, comparing each agreement key only once
+        target_keys = []
+        unique_agreements = OrderedDict()
+        for target in targets:
+            agreements = select_student_agreements(target['university'], target['major'], detected_college)
+            keys = []
+            for agreement in agreements:
+                agreement_key = agreement.get('agreement_key')
+                if agreement_key and agreement_key not in keys:
+                    keys.append(agreement_key)
+                    unique_agreements.setdefault(agreement_key, agreement)
+            target_keys.append(keys)
+        
+        unique_list = list(unique_agreements.values())
+        results = {
+            result['agreement_key']: result
+            for _, result in iter_agreement_comparisons(student_courses, unique_list)
+        }
+        
+        rows = []
+        for index, (target, keys) in enumerate(zip(targets, target_keys)):
+            cells = []
+            for agreement_key in keys:
+                result = results.get(agreement_key)
+                if not result:
+                    continue
+                cell = summarize_comparison(result)
+                if include_comparisons:
+                    cell['comparison'] = result['comparison']
+                cells.append(cell)
+            cells.sort(key=lambda c: -c['progress_percentage'])
             
-            comparison_results.append({
-                **agreement,
-                'comparison': comparison,
-                'agreement_data': agreement_data
+            rows.append({
+                'target_index': index,
+                'university': target['university'],
+                'major': target['major'],
+                'agreement_count': len(cells),
+                'best_progress_percentage': cells[0]['progress_percentage'] if cells else None,
+                'agreements': cells
             })
         
+        # Targets without any agreement go last
+        rows.sort(key=lambda r: (r['best_progress_percentage'] is None, -(r['best_progress_percentage'] or 0)))
+        for rank, row in enumerate(rows, start=1):
+            row['rank'] = rank
+        
         return jsonify({
-            'student_courses': student_courses,
-            'agreements': comparison_results,
-            'target_university': target_university,
-            'target_major': target_major,
-            'detected_college': detected_college
+            'detected_college': detected_college,
+            'extraction_id': extraction_id,
+            'student_course_count': len(student_courses),
+            'unique_agreements': len(unique_list),
+            'unique_files': len(group_agreements_by_file(unique_list)),
+            'targets': rows
         })
         
     except Exception as e:
@@ -1272,14 +1307,92 @@ def search_agreements_endpoint():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def requested_fields():
+    """Field names from the fields= query parameter (comma separated), or [] for everything"""
+    return [f.strip() for f in request.args.get('fields', '').split(',') if f.strip()]
+
+def wants_articulation_page():
+    return 'limit' in request.args or 'cursor' in request.args
+
+def file_stamp(file_path):
+    """Identifies one version of a file, so a page cursor can't silently span a rewrite"""
+    stat = os.stat(file_path)
+    return f"{stat.st_mtime_ns}-{stat.st_size}"
+
+def paginate_articulations(articulations, stamp):
+    """
+    Slice articulations by the limit= and cursor= query parameters.
+    Returns (page, next_cursor); next_cursor is None on the last page.
+    Raises ValueError for a malformed cursor or one issued for another version of the file.
+    """
+    if not isinstance(articulations, list):
+        articulations = []
+    
+    offset = 0
+    cursor = request.args.get('cursor')
+    if cursor:
+        try:
+            cursor_stamp, offset = base64.urlsafe_b64decode(cursor.encode()).decode().rsplit(':', 1)
+            offset = int(offset)
+        except ValueError:
+            raise ValueError('Invalid cursor')
+        if cursor_stamp != stamp or offset < 0:
+            raise ValueError('Cursor has expired, the agreement file has changed')
+    
+    limit = request.args.get('limit', ARTICULATION_PAGE_SIZE, type=int)
+    limit = max(1, min(limit, ARTICULATION_PAGE_MAX))
+    
+    page = articulations[offset:offset + limit]
+    next_cursor = None
+    if offset + limit < len(articulations):
+        next_cursor = base64.urlsafe_b64encode(f"{stamp}:{offset + limit}".encode()).decode()
+    return page, next_cursor
+
+def major_articulations(agreement_data):
+    """The articulations in agreement_data's file that belong to its selected major"""
+    articulations = (agreement_data.get('full_result') or {}).get('articulations')
+    if not isinstance(articulations, list):
+        return []
+    cell_ids = get_major_cell_ids(agreement_data)
+    return [a for a in articulations if isinstance(a, dict) and a.get('templateCellId') in cell_ids]
+
 @app.route('/api/agreement/<agreement_key>', methods=['GET'])
 def get_agreement(agreement_key):
-    """Get full agreement details"""
+    """
+    Get full agreement details.
+    - fields=major_data,assist_url limits the response to those top-level keys
+    - limit= / cursor= page through the major's articulations: full_result.articulations holds
+      one page and next_cursor fetches the following one (agreements without a full_result
+      have no articulations to page and are returned unpaged)
+    """
     try:
         agreement_data = load_agreement_json(agreement_key)
         if not agreement_data:
             return jsonify({'error': 'Agreement not found'}), 404
         
+        full_result = agreement_data.get('full_result')
+        if wants_articulation_page() and isinstance(full_result, dict):
+            filename, _ = split_agreement_key(agreement_key)
+            try:
+                page, next_cursor = paginate_articulations(
+                    major_articulations(agreement_data),
+                    file_stamp(resolve_agreement_file(filename))
+                )
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+            agreement_data = {
+                **agreement_data,
+                'full_result': {**full_result, 'articulations': page},
+                'next_cursor': next_cursor
+            }
+        
+        fields = requested_fields()
+        if fields:
+            selected = {f: agreement_data[f] for f in fields if f in agreement_data}
+            if 'next_cursor' in agreement_data:
+                selected['next_cursor'] = agreement_data['next_cursor']
+            agreement_data = selected
+        
         return jsonify(agreement_data)
         
     except Exception as e:
@@ -1288,7 +1401,15 @@ def get_agreement(agreement_key):
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
-    return jsonify({'status': 'ok', 'db_exists': os.path.exists(DB_NAME)})
+    return jsonify({
+        'status': 'ok',
+        'db_exists': os.path.exists(DB_NAME),
+        'agreement_cache': agreement_file_cache.stats(),
+        'evaluator_cache': evaluator_cache.stats(),
+        'recommendation_cache': recommendation_cache.stats(),
+        'openrouter': openrouter.stats(),
+        'analysis_jobs': analysis_jobs.stats()
+    })
 
 @app.route('/api/test-search', methods=['GET'])
 def test_search():
@@ -1301,8 +1422,7 @@ def test_search():
         agreements = search_agreements(university, major)
         
         # Also test what's in the database
-        conn = sqlite3.connect(DB_NAME)
-        cursor = conn.cursor()
+        cursor = get_db().cursor()
         
         normalized_uni = normalize_university_name(university)
         cursor.execute('''
@@ -1318,8 +1438,6 @@ def test_search():
         ''', [f"%{normalized_uni}%", f"%{major.upper()}%"])
         sample_results = cursor.fetchall()
         
-        conn.close()
-        
         return jsonify({
             'search_params': {
                 'university': university,
@@ -1340,10 +1458,9 @@ def test_search():
 def list_files():
     """List all available agreement files"""
     try:
-        files = glob.glob(os.path.join(DATA_DIR, "*_master.json"))
+        file_index = refresh_agreement_file_index()
         file_list = []
-        for file_path in files:
-            filename = os.path.basename(file_path)
+        for filename, file_path in sorted(file_index.items()):
             # Extract sending and receiving IDs from filename (e.g., "10_to_1_master.json")
             parts = filename.replace('_master.json', '').split('_to_')
             if len(parts) == 2:
@@ -1362,30 +1479,119 @@ def list_files():
 
 @app.route('/api/file/<filename>', methods=['GET'])
 def get_file(filename):
-    """Get raw file data by filename"""
+    """
+    Get raw file data by filename.
+    Without query parameters the file is sent as-is. Otherwise its nested JSON strings are decoded and:
+    - major= keeps only that major's templateAssets and articulations
+    - limit= / cursor= page through result.articulations (next_cursor fetches the following page)
+    - fields=templateAssets,articulations limits result to those keys
+    """
     try:
         # Security: ensure filename doesn't contain path traversal
         if '..' in filename or '/' in filename:
             return jsonify({'error': 'Invalid filename'}), 400
         
-        file_path = os.path.join(DATA_DIR, filename)
-        if not os.path.exists(file_path):
+        file_path = resolve_agreement_file(filename)
+        if not file_path:
             return jsonify({'error': 'File not found'}), 404
         
-        with open(file_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        
-        return jsonify(data)
+        major = request.args.get('major')
+        fields = requested_fields()
+        paging = wants_articulation_page()
+        if not (major or fields or paging):
+            # Nothing to transform: stream the bytes on disk (with ETag/conditional support)
+            return send_file(os.path.abspath(file_path), mimetype='application/json')
+        
+        data = agreement_file_cache.get(file_path)
+        result = dict(data.get('result') or {}) if isinstance(data, dict) else {}
+        
+        if major:
+            agreement_data = build_agreement_data(data, f"{filename}_{major}", major)
+            if not agreement_data or not agreement_data.get('major_data'):
+                return jsonify({'error': 'Major not found in file'}), 404
+            result['templateAssets'] = [agreement_data['major_data']]
+            result['articulations'] = major_articulations(agreement_data)
+        
+        next_cursor = None
+        if paging:
+            try:
+                result['articulations'], next_cursor = paginate_articulations(
+                    result.get('articulations'), file_stamp(file_path)
+                )
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+        
+        if fields:
+            result = {f: result[f] for f in fields if f in result}
+        
+        body = {**data, 'result': result}
+        if paging:
+            body['next_cursor'] = next_cursor
+        return jsonify(body)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/institutions', methods=['GET'])
-def list_institutions():
-    """List all unique sending and receiving institutions"""
-    try:
-        conn = sqlite3.connect(DB_NAME)
+# Serialized catalog responses by name, reused until the indexer changes catalog_hash
+_catalog_snapshots = {}
+_catalog_snapshots_lock = threading.Lock()
+
+def get_catalog_snapshot(name, build_payload):
+    """
+    Return the serialized catalog `name` ({'etag', 'last_modified', 'body', 'gzip_body'}).
+    build_payload(cursor, materialized) is only called when the catalog changed since
+    the cached copy was built; materialized is False for databases without catalog tables.
+    """
+    conn = get_db()
+    with _catalog_snapshots_lock:
         cursor = conn.cursor()
-        
+        # One read transaction, so a reindex committing mid-build can't mix two versions
+        cursor.execute('BEGIN')
+        try:
+            meta = {}
+            if has_table(cursor, 'catalog_meta'):
+                meta = dict(cursor.execute('SELECT key, value FROM catalog_meta').fetchall())
+            version = meta.get('catalog_hash')
+            
+            snapshot = _catalog_snapshots.get(name)
+            if snapshot and version and snapshot['version'] == version:
+                return snapshot
+            
+            body = app.json.dumps(build_payload(cursor, bool(version))).encode('utf-8')
+        finally:
+            conn.rollback()
+        
+        snapshot = {
+            'version': version,
+            'etag': hashlib.sha256(body).hexdigest()[:32],
+            'last_modified': int(meta['catalog_updated_at']) if version else None,
+            'body': body,
+            'gzip_body': gzip.compress(body)
+        }
+        if version:
+            _catalog_snapshots[name] = snapshot
+        return snapshot
+
+def catalog_response(snapshot):
+    """Serve a catalog snapshot with ETag/Last-Modified validators, gzip, and 304s for If-None-Match"""
+    use_gzip = bool(request.accept_encodings['gzip'])
+    response = app.response_class(snapshot['gzip_body'] if use_gzip else snapshot['body'], mimetype='application/json')
+    if use_gzip:
+        response.headers['Content-Encoding'] = 'gzip'
+    # Each encoding is a different representation, so it gets its own ETag
+    response.set_etag(snapshot['etag'] + ('-gz' if use_gzip else ''))
+    if snapshot['last_modified']:
+        response.last_modified = snapshot['last_modified']
+    response.headers['Cache-Control'] = 'no-cache'
+    response.vary.add('Accept-Encoding')
+    return response.make_conditional(request)
+
+def _institutions_payload(cursor, materialized):
+    if materialized:
+        cursor.execute("SELECT id, name FROM catalog_institutions WHERE kind = 'sending' ORDER BY name")
+        sending = [{'id': row[0], 'name': row[1]} for row in cursor.fetchall()]
+        cursor.execute("SELECT id, name FROM catalog_institutions WHERE kind = 'receiving' ORDER BY name")
+        receiving = [{'id': row[0], 'name': row[1]} for row in cursor.fetchall()]
+    else:
         # Get unique sending institutions
         cursor.execute('SELECT DISTINCT sending_id, sending_name FROM agreements ORDER BY sending_name')
         sending = [{'id': row[0], 'name': row[1]} for row in cursor.fetchall()]
@@ -1393,13 +1599,29 @@ def list_institutions():
         # Get unique receiving institutions
         cursor.execute('SELECT DISTINCT receiving_id, receiving_name FROM agreements ORDER BY receiving_name')
         receiving = [{'id': row[0], 'name': row[1]} for row in cursor.fetchall()]
-        
-        conn.close()
-        
-        return jsonify({
-            'sending_institutions': sending,
-            'receiving_institutions': receiving
-        })
+    
+    return {
+        'sending_institutions': sending,
+        'receiving_institutions': receiving
+    }
+
+def _majors_payload(cursor, materialized):
+    if materialized:
+        cursor.execute('SELECT major_name FROM catalog_majors ORDER BY major_name')
+    else:
+        cursor.execute('SELECT DISTINCT major_name FROM agreements ORDER BY major_name')
+    majors = [row[0] for row in cursor.fetchall()]
+    
+    return {
+        'majors': majors,
+        'total': len(majors)
+    }
+
+@app.route('/api/institutions', methods=['GET'])
+def list_institutions():
+    """List all unique sending and receiving institutions"""
+    try:
+        return catalog_response(get_catalog_snapshot('institutions', _institutions_payload))
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -1407,46 +1629,130 @@ def list_institutions():
 def list_majors():
     """List all unique majors"""
     try:
-        conn = sqlite3.connect(DB_NAME)
-        cursor = conn.cursor()
-        
-        cursor.execute('SELECT DISTINCT major_name FROM agreements ORDER BY major_name')
-        majors = [row[0] for row in cursor.fetchall()]
-        
-        conn.close()
-        
-        return jsonify({
-            'majors': majors,
-            'total': len(majors)
-        })
+        return catalog_response(get_catalog_snapshot('majors', _majors_payload))
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
-@app.route('/api/generate-recommendations', methods=['POST'])
-def generate_recommendations():
-    """Generate AI-powered recommendations based on student progress"""
-    try:
-        data = request.get_json()
-        
-        student_courses = data.get('student_courses', [])
-        completed_requirements = data.get('completed_requirements', [])
-        missing_requirements = data.get('missing_requirements', [])
-        target_university = data.get('target_university', '')
-        target_major = data.get('target_major', '')
-        gpa = data.get('gpa', 0)
-        progress_percentage = data.get('progress_percentage', 0)
-        detected_college = data.get('detected_college', '')
+class RecommendationCache:
+    """
+    In-memory TTL cache of generated recommendations.
+    Concurrent misses for the same key are coalesced: one caller generates (the leader)
+    and the others wait for its result. Failures are not cached.
+    """
+    
+    def __init__(self, ttl_seconds, max_entries):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (created_at, value)
+        self._inflight = {}  # key -> Future of the leader's result
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+    
+    def get(self, key):
+        """Return the cached value for key, or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if not entry:
+                return None
+            if time.time() - entry[0] > self.ttl_seconds:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+    
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.time(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+    
+    def get_or_compute(self, key, compute):
+        """Return (value, source) where source is 'hit', 'miss' (compute ran here) or 'coalesced'"""
+        value = self.get(key)
+        if value is not None:
+            return value, 'hit'
+        
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+                self.misses += 1
+            else:
+                self.coalesced += 1
         
-        # Build context for the AI
-        completed_list = ', '.join([c.get('course_code', '') for c in completed_requirements]) or 'None yet'
-        missing_list = ', '.join([f"{c.get('course_code', '')} (take {c.get('can_be_satisfied_by', 'N/A')})" for c in missing_requirements]) or 'None - all complete!'
-        course_list = ', '.join([f"{c.get('course_code', '')} ({c.get('grade', 'N/A')})" for c in student_courses[:15]])
+        if not leader:
+            return future.result(), 'coalesced'
         
-        prompt = f"""You are a helpful academic advisor. Be brief and direct.
+        try:
+            value = compute()
+        except BaseException as e:
+            with self._lock:
+                del self._inflight[key]
+            future.set_exception(e)
+            raise
+        
+        self.put(key, value)
+        with self._lock:
+            del self._inflight[key]
+        future.set_result(value)
+        return value, 'miss'
+    
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'in_flight': len(self._inflight),
+                'hits': self.hits,
+                'misses': self.misses,
+                'coalesced': self.coalesced
+            }
+
+recommendation_cache = RecommendationCache(RECOMMENDATION_CACHE_TTL_SECONDS, RECOMMENDATION_CACHE_MAX_ENTRIES)
+
+def _round_to_step(value, step):
+    try:
+        return round(round(float(value) / step) * step, 2)
+    except (TypeError, ValueError):
+        return 0
+
+def canonical_recommendation_request(data):
+    """
+    Reduce a generate-recommendations body to what the prompt uses: target, college,
+    sorted requirement codes, and GPA/progress rounded to RECOMMENDATION_*_STEP.
+    Requests with the same canonical form get the same prompt, and so share a cache entry.
+    """
+    completed = sorted({c.get('course_code', '') for c in data.get('completed_requirements', []) or []})
+    missing = sorted({
+        (c.get('course_code', ''), c.get('can_be_satisfied_by', 'N/A'))
+        for c in data.get('missing_requirements', []) or []
+    })
+    return {
+        'target_university': data.get('target_university', '') or '',
+        'target_major': data.get('target_major', '') or '',
+        'detected_college': data.get('detected_college', '') or '',
+        'completed': completed,
+        'missing': [list(m) for m in missing],
+        'gpa': _round_to_step(data.get('gpa', 0), RECOMMENDATION_GPA_STEP),
+        'progress_percentage': _round_to_step(data.get('progress_percentage', 0), RECOMMENDATION_PROGRESS_STEP)
+    }
 
-STUDENT: {detected_college or 'CC'} → {target_major} at {target_university}
-GPA: {gpa} | Progress: {progress_percentage}%
+def recommendation_payload(canonical):
+    """OpenRouter request for a canonical recommendation request"""
+    completed_list = ', '.join(canonical['completed']) or 'None yet'
+    missing_list = ', '.join([f"{code} (take {options})" for code, options in canonical['missing']]) or 'None - all complete!'
+    target_university = canonical['target_university']
+    
+    prompt = f"""You are a helpful academic advisor. Be brief and direct.
+
+STUDENT: {canonical['detected_college'] or 'CC'} → {canonical['target_major']} at {target_university}
+GPA: {canonical['gpa']:g} | Progress: {canonical['progress_percentage']:g}%
 Completed: {completed_list}
 Needed: {missing_list}
 
@@ -1460,40 +1766,44 @@ Give a SHORT response (max 150 words total) with these sections:
 
 Keep it brief, no emojis, no fluff. Be specific to their situation."""
 
-        # Make request to OpenRouter API
-        headers = {
-            "Authorization": f"Bearer {OPENROUTER_API_KEY}",
-            "Content-Type": "application/json",
-            "HTTP-Referer": "http://localhost:5000",
-            "X-Title": "Transfer Advisor"
-        }
-        
-        payload = {
-            "model": OPENROUTER_MODEL,
-            "messages": [
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ],
-            "max_tokens": 300
-        }
-        
-        api_response = requests.post(
-            f"{OPENROUTER_BASE_URL}/chat/completions",
-            headers=headers,
-            json=payload
-        )
+    return {
+        "model": OPENROUTER_MODEL,
+        "messages": [
+            {
+                "role": "user",
+                "content": prompt
+            }
+        ],
+        "max_tokens": 300
+    }
+
+def recommendation_cache_key(payload):
+    """Cache key for a recommendation: hash of the exact request sent to the model"""
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode('utf-8')).hexdigest()
+
+@app.route('/api/generate-recommendations', methods=['POST'])
+def generate_recommendations():
+    """
+    Generate AI-powered recommendations based on student progress.
+    Identical requests (see canonical_recommendation_request) are answered from recommendation_cache,
+    and concurrent identical requests share one model call.
+    """
+    try:
+        data = request.get_json()
+        payload = recommendation_payload(canonical_recommendation_request(data))
         
-        if api_response.status_code != 200:
-            error_msg = api_response.json().get('error', {}).get('message', 'Unknown error')
-            return jsonify({'error': f'AI API error: {error_msg}'}), 500
+        def generate():
+            response_data = openrouter.chat_completion(payload, "Transfer Advisor")
+            return response_data['choices'][0]['message']['content'].strip()
         
-        response_data = api_response.json()
-        recommendation_text = response_data['choices'][0]['message']['content'].strip()
+        try:
+            recommendation_text, source = recommendation_cache.get_or_compute(recommendation_cache_key(payload), generate)
+        except OpenRouterError as e:
+            return jsonify({'error': f'AI API error: {e}'}), 500
         
         return jsonify({
             'recommendations': recommendation_text,
+            'cached': source != 'miss',
             'success': True
         })
         
@@ -1501,6 +1811,93 @@ Keep it brief, no emojis, no fluff. Be specific to their situation."""
         print(f"[ERROR] Recommendations generation failed: {e}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/generate-recommendations/stream', methods=['POST'])
+def generate_recommendations_stream():
+    """
+    Streaming variant of /api/generate-recommendations (same body) using server-sent events:
+    - token: {'text'} for each piece of the recommendation as the model produces it
+    - done: {'recommendations', 'cached'} with the full text
+    - error: the model call failed mid-stream
+    When the client disconnects the upstream request is closed, which stops generation.
+    """
+    try:
+        data = request.get_json()
+        payload = recommendation_payload(canonical_recommendation_request(data))
+        cache_key = recommendation_cache_key(payload)
+        
+        cached = recommendation_cache.get(cache_key)
+        if cached is not None:
+            return sse_response(iter([
+                sse_event('token', {'text': cached}),
+                sse_event('done', {'recommendations': cached, 'cached': True})
+            ]))
+        
+        try:
+            upstream = openrouter.chat_completion({**payload, 'stream': True}, "Transfer Advisor", stream=True)
+        except OpenRouterError as e:
+            return jsonify({'error': f'AI API error: {e}'}), 500
+        
+    except Exception as e:
+        print(f"[ERROR] Recommendations generation failed: {e}")
+        return jsonify({'error': str(e)}), 500
+    
+    def generate():
+        pieces = []
+        try:
+            for line in upstream.iter_lines():
+                # Skip blank separators and ": keep-alive" comments
+                if not line.startswith(b'data:'):
+                    continue
+                chunk_data = line[5:].strip()
+                if chunk_data == b'[DONE]':
+                    break
+                chunk = json.loads(chunk_data)
+                if chunk.get('error'):
+                    yield sse_event('error', {'error': f"AI API error: {chunk['error'].get('message', 'Unknown error')}"})
+                    return
+                choices = chunk.get('choices') or [{}]
+                text = (choices[0].get('delta') or {}).get('content')
+                if text:
+                    pieces.append(text)
+                    yield sse_event('token', {'text': text})
+        except (OSError, ValueError) as e:
+            yield sse_event('error', {'error': f'AI API error: {e}'})
+            return
+        finally:
+            # Also runs when the client goes away and the server closes this generator
+            upstream.close()
+        
+        recommendation_text = ''.join(pieces).strip()
+        if recommendation_text:
+            recommendation_cache.put(cache_key, recommendation_text)
+        yield sse_event('done', {'recommendations': recommendation_text, 'cached': False})
+    
+    response = sse_response(generate())
+    # A generator that never started has no finally to run; this frees the upstream slot either way
+    response.call_on_close(upstream.close)
+    return response
+
+@app.after_request
+def compress_response(response):
+    """Compress JSON/text bodies with brotli (if installed) or gzip when the client accepts it"""
+    if (response.direct_passthrough or response.is_streamed
+            or response.status_code < 200 or response.status_code in (204, 304)
+            or 'Content-Encoding' in response.headers
+            or not (response.mimetype == 'application/json' or (response.mimetype or '').startswith('text/'))):
+        return response
+    
+    response.vary.add('Accept-Encoding')
+    body = response.get_data()
+    if len(body) < COMPRESSION_MIN_BYTES:
+        return response
+    
+    if brotli is not None and request.accept_encodings['br']:
+        response.set_data(brotli.compress(body, quality=5))
+        response.headers['Content-Encoding'] = 'br'
+    elif request.accept_encodings['gzip']:
+        response.set_data(gzip.compress(body, compresslevel=COMPRESSION_LEVEL))
+        response.headers['Content-Encoding'] = 'gzip'
+    return response
 
 if __name__ == '__main__':
     app.run(port=5000, debug=True)
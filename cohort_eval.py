@@ -0,0 +1,328 @@
+"""
+Evaluate a cohort of students against their transfer targets from the command line.
+
+Input is JSONL (one student per line) or CSV (one course per row, grouped by student_id):
+
+    {"student_id": "s1", "student_courses": [{"course_code": "MATH 1A", "grade": "A"}],
+     "university": "UC Berkeley", "major": "Computer Science", "detected_college": "De Anza"}
+
+    student_id,course_code,grade,credits,university,major,detected_college
+
+A JSONL line may list several targets as "targets": [{"university": ..., "major": ...}].
+Each target is evaluated with the same search and per-file comparison code as the API, and results are written to .jsonl, .csv or .parquet (needs pyarrow).
+Run it from the repository root, next to transfer_data.db and assist_data/.
+"""
+import argparse
+import csv
+import json
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+# Seconds between progress lines
+PROGRESS_INTERVAL = 2.0
+# Rows per Parquet row group
+PARQUET_ROW_GROUP = 10000
+# Students handed to a worker process at a time
+CHUNK_SIZE = 16
+
+OUTPUT_COLUMNS = [
+    ('student_id', 'string'),
+    ('university', 'string'),
+    ('major', 'string'),
+    ('agreement_count', 'int'),
+    ('agreement_key', 'string'),
+    ('sending_name', 'string'),
+    ('receiving_university', 'string'),
+    ('progress_percentage', 'float'),
+    ('course_progress_percentage', 'float'),
+    ('satisfied_groups', 'int'),
+    ('total_groups', 'int'),
+    ('completed_count', 'int'),
+    ('missing_count', 'int'),
+    ('error', 'string'),
+]
+
+def _student_targets(record):
+    targets = record.get('targets')
+    if isinstance(targets, list):
+        return [(t.get('university', ''), t.get('major', '')) for t in targets if isinstance(t, dict)]
+    return [(record.get('university', ''), record.get('major', ''))]
+
+def read_jsonl(path):
+    """Yield student dicts from a JSONL file"""
+    with open(path, 'r', encoding='utf-8') as f:
+        for line_number, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            yield {
+                'student_id': str(record.get('student_id', record.get('id', line_number))),
+                'courses': record.get('student_courses', record.get('courses', [])),
+                'targets': _student_targets(record),
+                'detected_college': record.get('detected_college', record.get('college_name'))
+            }
+
+def read_csv(path):
+    """Yield student dicts from a CSV with one course per row; rows need not be contiguous per student"""
+    students = {}
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        for row in csv.DictReader(f):
+            student_id = (row.get('student_id') or '').strip()
+            if not student_id:
+                continue
+            student = students.setdefault(student_id, {
+                'student_id': student_id,
+                'courses': [],
+                'targets': [],
+                'detected_college': None
+            })
+
+            if row.get('course_code'):
+                course = {'course_code': row['course_code']}
+                for field in ('course_name', 'grade'):
+                    if row.get(field):
+                        course[field] = row[field]
+                if row.get('credits'):
+                    try:
+                        course['credits'] = float(row['credits'])
+                    except ValueError:
+                        pass
+                student['courses'].append(course)
+
+            target = ((row.get('university') or '').strip(), (row.get('major') or '').strip())
+            if all(target) and target not in student['targets']:
+                student['targets'].append(target)
+            if row.get('detected_college') and not student['detected_college']:
+                student['detected_college'] = row['detected_college']
+
+    yield from students.values()
+
+def read_students(path):
+    if path.lower().endswith('.csv'):
+        return read_csv(path)
+    return read_jsonl(path)
+
+class JsonlWriter:
+    def __init__(self, path):
+        self._file = open(path, 'w', encoding='utf-8')
+
+    def write_rows(self, rows):
+        for row in rows:
+            self._file.write(json.dumps(row) + '\n')
+
+    def close(self):
+        self._file.close()
+
+class CsvWriter:
+    def __init__(self, path):
+        self._file = open(path, 'w', encoding='utf-8', newline='')
+        self._writer = csv.DictWriter(self._file, fieldnames=[name for name, _ in OUTPUT_COLUMNS])
+        self._writer.writeheader()
+
+    def write_rows(self, rows):
+        self._writer.writerows(rows)
+
+    def close(self):
+        self._file.close()
+
+class ParquetWriter:
+    """Buffers rows and writes them as Parquet row groups"""
+
+    def __init__(self, path):
+        types = {'string': pa.string(), 'int': pa.int64(), 'float': pa.float64()}
+        self._schema = pa.schema([(name, types[kind]) for name, kind in OUTPUT_COLUMNS])
+        self._writer = pq.ParquetWriter(path, self._schema)
+        self._rows = []
+
+    def _flush(self):
+        if self._rows:
+            self._writer.write_table(pa.Table.from_pylist(self._rows, schema=self._schema))
+            self._rows = []
+
+    def write_rows(self, rows):
+        self._rows.extend(rows)
+        if len(self._rows) >= PARQUET_ROW_GROUP:
+            self._flush()
+
+    def close(self):
+        self._flush()
+        self._writer.close()
+
+def open_writer(path):
+    if path.lower().endswith('.parquet'):
+        return ParquetWriter(path)
+    if path.lower().endswith('.csv'):
+        return CsvWriter(path)
+    return JsonlWriter(path)
+
+api = None
+
+def _init_worker():
+    """
+    Process initializer: load the API module once per process, so each process keeps its
+    decoded-file and evaluator caches across students. Compiled majors come from the shared index.
+    """
+    global api
+    # The API helpers log every step; switch that off so stdout stays the caller's
+    import agreements
+    import evaluator
+    import openrouter_client
+    agreements.DEBUG = False
+    evaluator.DEBUG = False
+    openrouter_client.DEBUG = False
+    import api_server
+    api_server.DEBUG = False
+    api = api_server
+
+def _target_row(student, university, major):
+    row = {name: None for name, _ in OUTPUT_COLUMNS}
+    row.update({
+        'student_id': student['student_id'],
+        'university': university,
+        'major': major,
+        'agreement_count': 0
+    })
+    return row
+
+def evaluate_student(student, all_agreements=False):
+    """
+    Return output rows for one student: the best agreement per target, or every agreement
+    with all_agreements. Never raises; a failure becomes a row with error set.
+    """
+    rows = []
+    for university, major in student['targets']:
+        row = _target_row(student, university, major)
+        if not university or not major:
+            row['error'] = 'Missing university or major'
+            rows.append(row)
+            continue
+
+        try:
+            found = api.select_student_agreements(university, major, student['detected_college'])
+            # Same path as the API: each agreement file is decoded once for all its majors
+            results = []
+            for group in api.group_agreements_by_file(found):
+                results.extend(api.compare_agreement_group(student['courses'], group))
+            results.sort(key=lambda item: item[0])
+
+            target_rows = []
+            for _, result in results:
+                comparison = result['comparison']
+                target_rows.append({
+                    **row,
+                    'agreement_key': result['agreement_key'],
+                    'sending_name': result.get('sending_name'),
+                    'receiving_university': result.get('receiving_university'),
+                    'progress_percentage': comparison['progress_percentage'],
+                    'course_progress_percentage': comparison['course_progress_percentage'],
+                    'satisfied_groups': comparison['satisfied_groups'],
+                    'total_groups': comparison['total_groups'],
+                    'completed_count': len(comparison['completed_required']),
+                    'missing_count': len(comparison['missing_required'])
+                })
+        except Exception as e:
+            row['error'] = str(e)
+            rows.append(row)
+            continue
+
+        for target_row in target_rows:
+            target_row['agreement_count'] = len(target_rows)
+        target_rows.sort(key=lambda r: -r['progress_percentage'])
+
+        if not target_rows:
+            rows.append(row)
+        elif all_agreements:
+            rows.extend(target_rows)
+        else:
+            rows.append(target_rows[0])
+    return rows
+
+def _evaluate_chunk(students, all_agreements):
+    return [evaluate_student(student, all_agreements) for student in students]
+
+def _chunks(students, chunk_size):
+    chunk = []
+    for student in students:
+        chunk.append(student)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def evaluate_cohort(students, workers=1, all_agreements=False, chunk_size=CHUNK_SIZE):
+    """Yield each student's rows in input order, spreading chunks of students over workers processes"""
+    if workers <= 1:
+        _init_worker()
+        for student in students:
+            yield evaluate_student(student, all_agreements)
+        return
+
+    # Keep a bounded window of submitted chunks so input and output both stream
+    executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker)
+    pending = deque()
+    try:
+        for chunk in _chunks(students, chunk_size):
+            pending.append(executor.submit(_evaluate_chunk, chunk, all_agreements))
+            if len(pending) >= workers * 2:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+    finally:
+        executor.shutdown(cancel_futures=True)
+
+def run(input_path, output_path, workers=1, all_agreements=False, chunk_size=CHUNK_SIZE):
+    writer = open_writer(output_path)
+    students_done = 0
+    rows_written = 0
+    errors = 0
+    start_time = time.perf_counter()
+    last_report = start_time
+
+    try:
+        for rows in evaluate_cohort(read_students(input_path), workers, all_agreements, chunk_size):
+            writer.write_rows(rows)
+            students_done += 1
+            rows_written += len(rows)
+            errors += sum(1 for row in rows if row['error'])
+
+            now = time.perf_counter()
+            if now - last_report >= PROGRESS_INTERVAL:
+                last_report = now
+                rate = students_done / (now - start_time)
+                print(f"[cohort] {students_done} students, {rows_written} rows ({rate:,.1f} students/sec)", file=sys.stderr)
+    finally:
+        writer.close()
+
+    elapsed = time.perf_counter() - start_time
+    rate = students_done / elapsed if elapsed > 0 else 0
+    print(f"Evaluated {students_done} students into {rows_written} rows in {elapsed:.2f}s "
+          f"({rate:,.1f} students/sec) -> {output_path}", file=sys.stderr)
+    if errors:
+        print(f"{errors} row(s) have an error; see the error column.", file=sys.stderr)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Evaluate a cohort of students against their transfer targets")
+    parser.add_argument('input', help="students as .jsonl or .csv")
+    parser.add_argument('output', help="results as .jsonl, .csv or .parquet")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="number of processes evaluating students in parallel (default 1)")
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE,
+                        help=f"students sent to a worker at a time (default {CHUNK_SIZE})")
+    parser.add_argument('--all-agreements', action='store_true',
+                        help="write a row per matching agreement instead of only the best one per target")
+    args = parser.parse_args()
+
+    if args.output.lower().endswith('.parquet') and pa is None:
+        parser.error("Parquet output needs pyarrow (pip install pyarrow)")
+    run(args.input, args.output, workers=max(1, args.workers), all_agreements=args.all_agreements,
+        chunk_size=max(1, args.chunk_size))
@@ -0,0 +1,298 @@
+"""
+Compiled form of one major's requirement structure, used to compare transcripts
+against it. Built from a compiled major record (see agreements.compile_major_record)
+once, then evaluated against any number of transcripts.
+"""
+from agreements import normalize_course_code
+
+# Set to False to silence the per-evaluation [DEBUG] output (e.g. in batch runs)
+DEBUG = True
+
+def _debug(message):
+    if DEBUG:
+        print(f"[DEBUG] {message}")
+
+def _satisfied_by_options(sending_courses):
+    """The 'can_be_satisfied_by' text for an unmatched requirement"""
+    cc_options = ', '.join([s.get('course_code', '') for s in sending_courses[:3]])
+    if len(sending_courses) > 3:
+        cc_options += f" (+{len(sending_courses) - 3} more)"
+    return cc_options
+
+class RequirementEvaluator:
+    """
+    A major's articulations and requirement groups compiled for repeated evaluation.
+
+    Each articulation mapping gets a slot. course_index maps a normalized CC course code to the
+    (slot, position in the mapping's sending courses) pairs it can satisfy, so evaluating a
+    transcript is one pass over the student's courses. When several of a student's courses
+    satisfy a slot, the one listed first in the agreement wins.
+    """
+
+    def __init__(self, compiled):
+        mappings = compiled['mappings']
+        requirement_groups = compiled['requirement_groups']
+
+        self.mapping_count = len(mappings)
+        self.has_groups = bool(requirement_groups)
+
+        # Inverted index: normalized sending course code -> [(slot, sending position)]
+        self.course_index = {}
+        self._slot_options = []
+        cell_to_slot = {}
+        for slot, mapping in enumerate(mappings):
+            sending_courses = mapping.get('sending_courses', [])
+            for position, sending in enumerate(sending_courses):
+                code = sending.get('normalized_code', '')
+                if code:
+                    self.course_index.setdefault(code, []).append((slot, position))
+            self._slot_options.append(_satisfied_by_options(sending_courses))
+
+            # A later mapping for the same cell replaces the earlier one
+            cell_id = mapping.get('template_cell_id', '')
+            if cell_id:
+                cell_to_slot[cell_id] = slot
+
+        grouped_cells = set()
+        self.groups = []
+        for group_id, group_info in requirement_groups.items():
+            course_cell_ids = group_info.get('course_cell_ids', [])
+            group_title = group_info.get('title', '')
+            instruction_type = group_info.get('instruction_type', 'Following')
+            section_rules = group_info.get('section_rules', [])
+            grouped_cells.update(course_cell_ids)
+
+            # Requirement template for each of the group's cells that has an articulation
+            cells = {}
+            for cell_id in course_cell_ids:
+                slot = cell_to_slot.get(cell_id)
+                if slot is None:
+                    continue
+                receiving_course = mappings[slot].get('receiving_course', {})
+                cells[cell_id] = (slot, {
+                    'course_code': receiving_course.get('course_code', ''),
+                    'course_name': receiving_course.get('course_name', ''),
+                    'normalized_code': receiving_course.get('normalized_code', ''),
+                    'group_id': group_id,
+                    'group_title': group_title,
+                    'cell_id': cell_id
+                })
+
+            sections = []
+            for section in section_rules:
+                section_cell_ids = section.get('cell_ids', [])
+                sections.append((
+                    section.get('required', len(section_cell_ids)),
+                    section.get('is_select_n', False),
+                    [cid for cid in section_cell_ids if cid in cells]
+                ))
+
+            has_select_n = any(s.get('is_select_n', False) for s in section_rules) if section_rules else False
+            self.groups.append({
+                'group_id': group_id,
+                'title': group_title,
+                'instruction_type': 'NFromArea' if has_select_n or instruction_type == 'NFromArea' else instruction_type,
+                'required_count': group_info.get('required_count', 0),
+                'total_options': len(course_cell_ids),
+                'cells': cells,
+                'sections': sections
+            })
+
+        # Articulations outside every group are reported individually
+        self.ungrouped = []
+        for slot, mapping in enumerate(mappings):
+            cell_id = mapping.get('template_cell_id', '')
+            if cell_id and cell_id in grouped_cells:
+                continue
+            receiving_course = mapping.get('receiving_course', {})
+            self.ungrouped.append((slot, {
+                'course_code': receiving_course.get('course_code', ''),
+                'course_name': receiving_course.get('course_name', ''),
+                'normalized_code': receiving_course.get('normalized_code', '')
+            }))
+
+    def match_courses(self, student_courses):
+        """
+        Return {slot: student course} for every articulation the student satisfies.
+        A normalized code that appears more than once on the transcript refers to its last entry.
+        """
+        student_course_map = {}
+        for course in student_courses:
+            normalized = normalize_course_code(course.get('course_code', ''))
+            if normalized:
+                student_course_map[normalized] = course
+
+        _debug(f"Student courses normalized: {list(student_course_map)[:10]}...")
+
+        best = {}  # slot -> (sending position, normalized code)
+        for code in student_course_map:
+            for slot, position in self.course_index.get(code, ()):
+                current = best.get(slot)
+                if current is None or position < current[0]:
+                    best[slot] = (position, code)
+
+        return {slot: student_course_map[code] for slot, (_, code) in best.items()}
+
+    def _course_info(self, template, slot, matches):
+        course_info = dict(template)
+        if slot in matches:
+            student_course = matches[slot]
+            course_info['satisfied_by'] = student_course.get('course_code', '') if student_course else ''
+            course_info['student_grade'] = student_course.get('grade', '') if student_course else ''
+            course_info['student_credits'] = student_course.get('credits', 0) if student_course else 0
+        else:
+            course_info['can_be_satisfied_by'] = self._slot_options[slot]
+        return course_info
+
+    def evaluate(self, student_courses):
+        """Compare a transcript against the major; returns the compare_transcript_to_agreement result"""
+        matches = self.match_courses(student_courses)
+
+        group_results = {}
+        completed_required = []
+        missing_required = []
+
+        for group in self.groups:
+            group_id = group['group_id']
+            group_title = group['title']
+            cells = group['cells']
+
+            cell_course_info_map = {
+                cell_id: self._course_info(template, slot, matches)
+                for cell_id, (slot, template) in cells.items()
+            }
+
+            completed_in_group = []
+            missing_in_group = []
+            effective_completed = 0
+            effective_required = 0
+
+            if group['sections']:
+                for section_required, is_select_n, section_cell_ids in group['sections']:
+                    section_completed = []
+                    section_missing = []
+                    for cid in section_cell_ids:
+                        if cells[cid][0] in matches:
+                            section_completed.append(cell_course_info_map[cid])
+                        else:
+                            section_missing.append(cell_course_info_map[cid])
+
+                    section_completed_count = len(section_completed)
+
+                    if is_select_n:
+                        # "Select N from list" section - cap contributions at required amount
+                        effective_completed += min(section_completed_count, section_required)
+                        effective_required += section_required
+                        completed_in_group.extend(section_completed[:section_required])
+
+                        # For missing: only show what's needed, as a choice
+                        if section_completed_count < section_required and section_missing:
+                            needed = section_required - section_completed_count
+                            alternatives = [m.get('course_name', m.get('course_code', '')) for m in section_missing[:5]]
+                            missing_in_group.append({
+                                'course_code': f"Select {needed}",
+                                'course_name': ' OR '.join(alternatives) + ('...' if len(section_missing) > 5 else ''),
+                                'is_choice': True,
+                                'choice_count': needed,
+                                'alternatives': section_missing,
+                                'group_id': group_id,
+                                'group_title': group_title
+                            })
+                    else:
+                        # All required section
+                        effective_completed += section_completed_count
+                        effective_required += section_required
+                        completed_in_group.extend(section_completed)
+                        missing_in_group.extend(section_missing)
+            else:
+                # No section rules - every articulated cell counts
+                for cid, course_info in cell_course_info_map.items():
+                    if cells[cid][0] in matches:
+                        completed_in_group.append(course_info)
+                    else:
+                        missing_in_group.append(course_info)
+
+                effective_completed = len(completed_in_group)
+                effective_required = group['required_count']
+
+            group_satisfied = effective_completed >= effective_required if effective_required > 0 else True
+
+            group_results[group_id] = {
+                'title': group_title,
+                'instruction_type': group['instruction_type'],
+                'required_count': effective_required,
+                'total_options': group['total_options'],
+                'completed_count': effective_completed,
+                'satisfied': group_satisfied,
+                'remaining_needed': max(0, effective_required - effective_completed),
+                'completed_courses': completed_in_group,
+                'missing_courses': missing_in_group
+            }
+
+            completed_required.extend(completed_in_group)
+            missing_required.extend(missing_in_group)
+
+        for slot, template in self.ungrouped:
+            course_info = self._course_info(template, slot, matches)
+            if slot in matches:
+                completed_required.append(course_info)
+            else:
+                missing_required.append(course_info)
+
+        completed_required = self._dedupe(completed_required)
+        missing_required = self._dedupe(missing_required)
+
+        # Progress at the group level: average of group completion, capped at 100% per group
+        total_groups = len(self.groups) if self.has_groups else max(1, self.mapping_count)
+        satisfied_groups = sum(1 for g in group_results.values() if g.get('satisfied', False))
+
+        if not self.has_groups:
+            # No groups parsed, fall back to course-level calculation
+            total_required = self.mapping_count
+            progress_percentage = (len(completed_required) / total_required * 100) if total_required > 0 else 0
+        else:
+            group_progress_sum = 0
+            for g in group_results.values():
+                req = g.get('required_count', 1)
+                if req > 0:
+                    group_progress_sum += min(1.0, g.get('completed_count', 0) / req)
+                else:
+                    group_progress_sum += 1.0  # Empty group counts as complete
+            progress_percentage = (group_progress_sum / total_groups * 100) if total_groups > 0 else 0
+
+        # Also calculate simple course-level progress for comparison
+        course_level_progress = 0
+        total_courses_needed = len(completed_required) + len(missing_required)
+        if total_courses_needed > 0:
+            course_level_progress = round(len(completed_required) / total_courses_needed * 100, 1)
+
+        _debug(f"Group-level progress: {satisfied_groups}/{total_groups} groups satisfied")
+        _debug(f"Weighted progress: {round(progress_percentage, 1)}%")
+        _debug(f"Course-level: {len(completed_required)} completed, {len(missing_required)} remaining ({course_level_progress}%)")
+
+        return {
+            'progress_percentage': round(progress_percentage, 1),
+            'course_progress_percentage': course_level_progress,  # Simple X/Y courses
+            'prereq_progress': 100,  # Not tracking separately
+            'completed_required': completed_required,
+            'missing_required': missing_required,
+            'completed_prerequisites': [],
+            'missing_prerequisites': [],
+            'total_required': len(completed_required) + len(missing_required),
+            'total_prerequisites': 0,
+            'group_results': group_results,  # Detailed per-group breakdown
+            'total_groups': total_groups,
+            'satisfied_groups': satisfied_groups
+        }
+
+    @staticmethod
+    def _dedupe(courses):
+        """Keep the first course per normalized_code, dropping entries without one"""
+        seen = set()
+        deduped = []
+        for course in courses:
+            key = course.get('normalized_code', '')
+            if key and key not in seen:
+                seen.add(key)
+                deduped.append(course)
+        return deduped
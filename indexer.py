@@ -2,10 +2,33 @@ import sqlite3
 import json
 import os
 import glob
+import time
+import argparse
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+import agreements
+from agreements import decode_agreement_file, compile_major_record
+from search import normalize_major_name, major_trigrams, institution_alias_rows
 
 # Configuration
 DATA_DIR = "assist_data"
 DB_NAME = "transfer_data.db"
+# Rows buffered before each executemany call during a bulk load
+BATCH_SIZE = 5000
+# Bump when the schema or derived columns change; older databases are rebuilt in full
+INDEX_SCHEMA_VERSION = 6
+
+AGREEMENT_INSERT_SQL = '''
+    INSERT INTO agreements 
+    (sending_id, sending_name, receiving_id, receiving_name, major_name, agreement_key, source_file, major_norm)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+COMPILED_INSERT_SQL = '''
+    INSERT OR REPLACE INTO compiled_majors
+    (agreement_key, file_name, major_name, source_mtime_ns, source_size, record)
+    VALUES (?, ?, ?, ?, ?, ?)
+'''
 
 def init_db():
     """Create the database and table schema"""
@@ -22,129 +45,465 @@ def init_db():
             receiving_name TEXT,
             major_name TEXT,
             agreement_key TEXT,
-            year INTEGER
+            year INTEGER,
+            source_file TEXT,
+            major_norm TEXT
         )
     ''')
     
-    # Create an index on major_name for fast searching
-    cursor.execute('CREATE INDEX IF NOT EXISTS idx_major ON agreements(major_name)')
+    # Add columns missing from databases built by older versions (they get a full rebuild)
+    columns = [row[1] for row in cursor.execute('PRAGMA table_info(agreements)')]
+    for column in ('source_file', 'major_norm'):
+        if column not in columns:
+            cursor.execute(f'ALTER TABLE agreements ADD COLUMN {column} TEXT')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_agreements_source_file ON agreements(source_file)')
+    
+    # Pre-digested requirement structure per (file, major), loaded by the API instead of
+    # walking the raw ASSIST JSON on every request. source_mtime_ns/source_size let the
+    # API detect records that are stale relative to the file on disk.
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS compiled_majors (
+            agreement_key TEXT PRIMARY KEY,
+            file_name TEXT,
+            major_name TEXT,
+            source_mtime_ns INTEGER,
+            source_size INTEGER,
+            record TEXT
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_compiled_file ON compiled_majors(file_name)')
+    
+    # Full-text index over agreements (rowid = agreements.id). major_name holds the
+    # normalized major (degree suffixes like "B.S." removed) so they never affect matching.
+    cursor.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS agreements_fts USING fts5(
+            major_name,
+            sending_name,
+            receiving_name,
+            prefix = '2 3',
+            tokenize = 'unicode61 remove_diacritics 2'
+        )
+    ''')
+    
+    # Trigram index over the distinct normalized majors, for fuzzy "no exact match" searches
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS major_terms (
+            id INTEGER PRIMARY KEY,
+            major_norm TEXT UNIQUE,
+            trigram_count INTEGER
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS major_trigrams (
+            trigram TEXT,
+            term_id INTEGER
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_major_trigrams ON major_trigrams(trigram, term_id)')
+    
+    # Dropdown catalogs served by /api/institutions and /api/majors, materialized once per run
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS catalog_institutions (
+            kind TEXT,
+            id INTEGER,
+            name TEXT
+        )
+    ''')
+    cursor.execute('CREATE TABLE IF NOT EXISTS catalog_majors (major_name TEXT)')
+    # catalog_hash changes only when catalog contents change; catalog_updated_at is when it last did
+    cursor.execute('CREATE TABLE IF NOT EXISTS catalog_meta (key TEXT PRIMARY KEY, value TEXT)')
+    
+    # Every name an institution can be searched by (its normalized names, short forms and curated
+    # abbreviations), loaded by the API to resolve a typed university to an id
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS institution_aliases (
+            alias TEXT,
+            kind TEXT,
+            institution_id INTEGER,
+            name TEXT,
+            source TEXT
+        )
+    ''')
+    
+    # Manifest of indexed source files, used to reparse only new or changed files
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS source_files (
+            file_name TEXT PRIMARY KEY,
+            mtime_ns INTEGER,
+            size INTEGER,
+            sha256 TEXT
+        )
+    ''')
     conn.commit()
     return conn
 
-def index_files():
+def file_sha256(file_path):
+    """Hash a file's contents in chunks"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def delete_file_rows(cursor, file_name):
+    """Remove everything indexed from one source file"""
+    cursor.execute('DELETE FROM agreements_fts WHERE rowid IN (SELECT id FROM agreements WHERE source_file = ?)', (file_name,))
+    cursor.execute('DELETE FROM agreements WHERE source_file = ?', (file_name,))
+    cursor.execute('DELETE FROM compiled_majors WHERE file_name = ?', (file_name,))
+
+def create_indexes(cursor):
+    """Create the secondary indexes (done after a bulk load rather than maintained during it)"""
+    # Create an index on major_name for fast searching
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_major ON agreements(major_name)')
+    # Fuzzy matches are resolved to agreements through major_norm
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_major_norm ON agreements(major_norm)')
+    # Searches for a resolved university filter on receiving_id
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_receiving_major_norm ON agreements(receiving_id, major_norm)')
+
+def build_catalog(cursor):
+    """Rebuild the institution and major catalogs; returns True if their contents changed"""
+    cursor.execute('DELETE FROM catalog_institutions')
+    cursor.execute('''
+        INSERT INTO catalog_institutions (kind, id, name)
+        SELECT DISTINCT 'sending', sending_id, sending_name FROM agreements ORDER BY sending_name
+    ''')
+    cursor.execute('''
+        INSERT INTO catalog_institutions (kind, id, name)
+        SELECT DISTINCT 'receiving', receiving_id, receiving_name FROM agreements ORDER BY receiving_name
+    ''')
+    cursor.execute('DELETE FROM catalog_majors')
+    cursor.execute('INSERT INTO catalog_majors (major_name) SELECT DISTINCT major_name FROM agreements ORDER BY major_name')
+    
+    digest = hashlib.sha256()
+    for row in cursor.execute('SELECT kind, id, name FROM catalog_institutions ORDER BY kind, name, id'):
+        digest.update(repr(row).encode('utf-8'))
+    for row in cursor.execute('SELECT major_name FROM catalog_majors ORDER BY major_name'):
+        digest.update(repr(row).encode('utf-8'))
+    catalog_hash = digest.hexdigest()
+    
+    previous = cursor.execute("SELECT value FROM catalog_meta WHERE key = 'catalog_hash'").fetchone()
+    if previous and previous[0] == catalog_hash:
+        return False
+    cursor.executemany('INSERT OR REPLACE INTO catalog_meta (key, value) VALUES (?, ?)', [
+        ('catalog_hash', catalog_hash),
+        ('catalog_updated_at', str(int(time.time())))
+    ])
+    return True
+
+def build_institution_aliases(cursor):
+    """Rebuild institution_aliases from the institution catalog; returns the number of aliases"""
+    cursor.execute('DELETE FROM institution_aliases')
+    institutions = cursor.execute('SELECT kind, id, name FROM catalog_institutions').fetchall()
+    rows = institution_alias_rows(institutions)
+    cursor.executemany(
+        'INSERT INTO institution_aliases (alias, kind, institution_id, name, source) VALUES (?, ?, ?, ?, ?)',
+        rows
+    )
+    return len(rows)
+
+def build_major_trigram_index(cursor):
+    """Rebuild major_terms/major_trigrams from the distinct normalized majors (a few thousand at most)"""
+    cursor.execute('DELETE FROM major_trigrams')
+    cursor.execute('DELETE FROM major_terms')
+    
+    majors = [row[0] for row in cursor.execute(
+        "SELECT DISTINCT major_norm FROM agreements WHERE major_norm IS NOT NULL AND major_norm != '' ORDER BY major_norm"
+    )]
+    trigram_rows = []
+    for term_id, major_norm in enumerate(majors, start=1):
+        trigrams = major_trigrams(major_norm)
+        cursor.execute('INSERT INTO major_terms (id, major_norm, trigram_count) VALUES (?, ?, ?)',
+                       (term_id, major_norm, len(trigrams)))
+        trigram_rows.extend((trigram, term_id) for trigram in sorted(trigrams))
+    cursor.executemany('INSERT INTO major_trigrams (trigram, term_id) VALUES (?, ?)', trigram_rows)
+    return len(majors)
+
+def parse_agreement_file(file_path):
+    """
+    Parse one agreement file into rows for the agreements and compiled_majors tables.
+    Returns (agreement_rows, compiled_rows).
+    """
+    agreement_rows = []
+    compiled_rows = []
+    
+    stat = os.stat(file_path)
+    # Skip empty files
+    if not stat.st_size:
+        return agreement_rows, compiled_rows
+    
+    # Decodes the nested JSON strings (institutions, templateAssets, articulations) too
+    json_data = decode_agreement_file(file_path)
+    file_basename = os.path.basename(file_path)
+    
+    # Handle dict structure with 'result' key
+    if isinstance(json_data, dict) and 'result' in json_data:
+        result = json_data['result']
+        
+        sending_inst = result.get('sendingInstitution')
+        receiving_inst = result.get('receivingInstitution')
+        if not isinstance(sending_inst, dict) or not isinstance(receiving_inst, dict):
+            sending_inst = {}
+            receiving_inst = {}
+        
+        # Extract institution names (they're in a names array)
+        sending_name = 'Unknown CC'
+        if sending_inst.get('names') and len(sending_inst['names']) > 0:
+            sending_name = sending_inst['names'][0].get('name', 'Unknown CC')
+        
+        receiving_name = 'Unknown Uni'
+        if receiving_inst.get('names') and len(receiving_inst['names']) > 0:
+            receiving_name = receiving_inst['names'][0].get('name', 'Unknown Uni')
+        
+        sending_id = sending_inst.get('id')
+        receiving_id = receiving_inst.get('id')
+        
+        # Extract majors from templateAssets
+        template_assets = result.get('templateAssets')
+        if not isinstance(template_assets, list):
+            template_assets = []
+        
+        # Each template asset is a major
+        for major in template_assets:
+            major_name = major.get('name', 'Unknown Major')
+            if not major_name or major_name == 'Unknown Major':
+                continue
+            
+            # Create a unique agreement key from filename + major name
+            agreement_key = f"{file_basename}_{major_name}"
+            
+            agreement_rows.append((
+                sending_id, 
+                sending_name, 
+                receiving_id, 
+                receiving_name, 
+                major_name, 
+                agreement_key,
+                file_basename,
+                normalize_major_name(major_name)
+            ))
+            
+            # Compile step: store the pre-digested requirement structure for this major
+            record = compile_major_record({
+                'major_data': major,
+                'full_result': result,
+                'agreement_key': agreement_key
+            })
+            compiled_rows.append((
+                agreement_key,
+                file_basename,
+                major_name,
+                stat.st_mtime_ns,
+                stat.st_size,
+                json.dumps(record, separators=(',', ':'))
+            ))
+    
+    # Also handle list structure (for backwards compatibility)
+    elif isinstance(json_data, list):
+        for item in json_data:
+            send_inst = item.get('sendingInstitution', {})
+            recv_inst = item.get('receivingInstitution', {})
+            
+            sending_name = send_inst.get('name', 'Unknown CC')
+            receiving_name = recv_inst.get('name', 'Unknown Uni')
+            
+            major_name = item.get('label') or item.get('major') or "Unknown Major"
+            agreement_key = item.get('key')
+            
+            agreement_rows.append((
+                send_inst.get('id'), 
+                sending_name, 
+                recv_inst.get('id'), 
+                receiving_name, 
+                major_name, 
+                agreement_key,
+                file_basename,
+                normalize_major_name(major_name)
+            ))
+    
+    return agreement_rows, compiled_rows
+
+def _init_worker():
+    """Process-pool initializer"""
+    agreements.DEBUG = False
+
+def _parse_file_task(file_path):
+    """
+    Parse one file for index_files. Never raises, so a bad file is reported in the
+    summary instead of aborting the run; returns (file_path, agreement_rows, compiled_rows, error).
+    """
+    try:
+        agreement_rows, compiled_rows = parse_agreement_file(file_path)
+        return file_path, agreement_rows, compiled_rows, None
+    except Exception as e:
+        return file_path, [], [], f"{type(e).__name__}: {e}"
+
+def index_files(batch_size=BATCH_SIZE, workers=1, full=False):
+    """
+    Index DATA_DIR into DB_NAME.
+    By default only new or changed files (per the source_files manifest) are reparsed,
+    and rows for deleted files are dropped. full=True rebuilds everything.
+    """
     conn = init_db()
     cursor = conn.cursor()
     
-    # Find all JSON files
-    files = glob.glob(os.path.join(DATA_DIR, "*_master.json"))
-    print(f"Found {len(files)} files to index.")
-
-    count = 0
+    # The per-major extraction output is too noisy when indexing every file
+    agreements.DEBUG = False
+    
+    # Bulk-load settings. WAL lets the API keep reading while we write, and an
+    # interrupted build is simply rerun, so we don't pay for fsyncs.
+    cursor.execute('PRAGMA journal_mode=WAL')
+    cursor.execute('PRAGMA synchronous=OFF')
+    
+    manifest = {
+        row[0]: (row[1], row[2], row[3])
+        for row in cursor.execute('SELECT file_name, mtime_ns, size, sha256 FROM source_files')
+    }
+    
+    # Databases from older indexer versions lack derived columns or the manifest
+    schema_version = cursor.execute('PRAGMA user_version').fetchone()[0]
+    if not full and schema_version != INDEX_SCHEMA_VERSION:
+        print(f"Index schema version {schema_version} is out of date, doing a full rebuild.")
+        full = True
+    
+    if full:
+        cursor.execute('DELETE FROM agreements_fts')
+        cursor.execute('DELETE FROM agreements')
+        cursor.execute('DELETE FROM compiled_majors')
+        cursor.execute('DELETE FROM source_files')
+        cursor.execute("DELETE FROM sqlite_sequence WHERE name = 'agreements'")
+        manifest = {}
+        # Build the secondary indexes once at the end instead of updating them per row
+        cursor.execute('DROP INDEX IF EXISTS idx_major')
+        cursor.execute('DROP INDEX IF EXISTS idx_major_norm')
+        cursor.execute('DROP INDEX IF EXISTS idx_receiving_major_norm')
     
+    # Find all JSON files (sorted so row ids are the same on every run)
+    files = sorted(glob.glob(os.path.join(DATA_DIR, "*_master.json")))
+    
+    # Work out which files need parsing. mtime/size is the cheap check; the hash
+    # catches files that were rewritten with identical contents.
+    to_parse = []
+    file_stats = {}
+    touched = 0
     for file_path in files:
-        try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                data = f.read()
-                # Skip empty files
-                if not data: continue
-                
-                json_data = json.loads(data)
-                
-                # Handle dict structure with 'result' key
-                if isinstance(json_data, dict) and 'result' in json_data:
-                    result = json_data['result']
-                    
-                    # Parse institutions from JSON strings
-                    sending_inst_str = result.get('sendingInstitution', '{}')
-                    receiving_inst_str = result.get('receivingInstitution', '{}')
-                    
-                    try:
-                        sending_inst = json.loads(sending_inst_str) if isinstance(sending_inst_str, str) else sending_inst_str
-                        receiving_inst = json.loads(receiving_inst_str) if isinstance(receiving_inst_str, str) else receiving_inst_str
-                    except:
-                        sending_inst = {}
-                        receiving_inst = {}
-                    
-                    # Extract institution names (they're in a names array)
-                    sending_name = 'Unknown CC'
-                    if sending_inst.get('names') and len(sending_inst['names']) > 0:
-                        sending_name = sending_inst['names'][0].get('name', 'Unknown CC')
-                    
-                    receiving_name = 'Unknown Uni'
-                    if receiving_inst.get('names') and len(receiving_inst['names']) > 0:
-                        receiving_name = receiving_inst['names'][0].get('name', 'Unknown Uni')
-                    
-                    sending_id = sending_inst.get('id')
-                    receiving_id = receiving_inst.get('id')
-                    
-                    # Extract majors from templateAssets
-                    template_assets_str = result.get('templateAssets', '[]')
-                    try:
-                        template_assets = json.loads(template_assets_str) if isinstance(template_assets_str, str) else template_assets_str
-                    except:
-                        template_assets = []
-                    
-                    if not isinstance(template_assets, list):
-                        template_assets = []
-                    
-                    # Each template asset is a major
-                    for major in template_assets:
-                        major_name = major.get('name', 'Unknown Major')
-                        if not major_name or major_name == 'Unknown Major':
-                            continue
-                        
-                        # Create a unique agreement key from filename + major name
-                        file_basename = os.path.basename(file_path)
-                        agreement_key = f"{file_basename}_{major_name}"
-                        
-                        cursor.execute('''
-                            INSERT INTO agreements 
-                            (sending_id, sending_name, receiving_id, receiving_name, major_name, agreement_key)
-                            VALUES (?, ?, ?, ?, ?, ?)
-                        ''', (
-                            sending_id, 
-                            sending_name, 
-                            receiving_id, 
-                            receiving_name, 
-                            major_name, 
-                            agreement_key
-                        ))
-                        count += 1
-                
-                # Also handle list structure (for backwards compatibility)
-                elif isinstance(json_data, list):
-                    for item in json_data:
-                        send_inst = item.get('sendingInstitution', {})
-                        recv_inst = item.get('receivingInstitution', {})
-                        
-                        sending_name = send_inst.get('name', 'Unknown CC')
-                        receiving_name = recv_inst.get('name', 'Unknown Uni')
-                        
-                        major_name = item.get('label') or item.get('major') or "Unknown Major"
-                        agreement_key = item.get('key')
-                        
-                        cursor.execute('''
-                            INSERT INTO agreements 
-                            (sending_id, sending_name, receiving_id, receiving_name, major_name, agreement_key)
-                            VALUES (?, ?, ?, ?, ?, ?)
-                        ''', (
-                            send_inst.get('id'), 
-                            sending_name, 
-                            recv_inst.get('id'), 
-                            receiving_name, 
-                            major_name, 
-                            agreement_key
-                        ))
-                        count += 1
-                        
-        except Exception as e:
-            print(f"Error parsing {file_path}: {e}")
-            import traceback
-            traceback.print_exc()
+        file_name = os.path.basename(file_path)
+        stat = os.stat(file_path)
+        known = manifest.get(file_name)
+        if known and known[0] == stat.st_mtime_ns and known[1] == stat.st_size:
+            continue
+        
+        sha256 = file_sha256(file_path)
+        file_stats[file_name] = (stat.st_mtime_ns, stat.st_size, sha256)
+        if known and known[2] == sha256:
+            cursor.execute('UPDATE source_files SET mtime_ns = ?, size = ? WHERE file_name = ?',
+                           (stat.st_mtime_ns, stat.st_size, file_name))
+            cursor.execute('UPDATE compiled_majors SET source_mtime_ns = ?, source_size = ? WHERE file_name = ?',
+                           (stat.st_mtime_ns, stat.st_size, file_name))
+            touched += 1
+            continue
+        to_parse.append(file_path)
+    
+    current_names = {os.path.basename(file_path) for file_path in files}
+    removed = sorted(name for name in manifest if name not in current_names)
+    for file_name in removed:
+        delete_file_rows(cursor, file_name)
+        cursor.execute('DELETE FROM source_files WHERE file_name = ?', (file_name,))
+    
+    new_count = sum(1 for file_path in to_parse if os.path.basename(file_path) not in manifest)
+    print(f"Found {len(files)} files: {new_count} new, {len(to_parse) - new_count} changed, "
+          f"{len(removed)} removed, {len(files) - len(to_parse)} unchanged. "
+          f"Parsing {len(to_parse)} using {workers} worker(s).")
 
+    # New rows get ids above this (AUTOINCREMENT), which is how we find them for the FTS index
+    last_id_before = cursor.execute('SELECT COALESCE(MAX(id), 0) FROM agreements').fetchone()[0]
+    
+    count = 0
+    compiled_count = 0
+    pending_agreements = []
+    pending_compiled = []
+    errors = []
+    start_time = time.perf_counter()
+    
+    def flush():
+        nonlocal count, compiled_count
+        if pending_agreements:
+            cursor.executemany(AGREEMENT_INSERT_SQL, pending_agreements)
+            count += len(pending_agreements)
+            pending_agreements.clear()
+        if pending_compiled:
+            cursor.executemany(COMPILED_INSERT_SQL, pending_compiled)
+            compiled_count += len(pending_compiled)
+            pending_compiled.clear()
+    
+    # Workers only parse; this process owns the connection and does all writes.
+    # map() yields results in input order, so the output is deterministic.
+    executor = None
+    if workers > 1 and len(to_parse) > 1:
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker)
+        chunksize = max(1, len(to_parse) // (workers * 8))
+        results = executor.map(_parse_file_task, to_parse, chunksize=chunksize)
+    else:
+        results = map(_parse_file_task, to_parse)
+    
+    try:
+        for file_path, agreement_rows, compiled_rows, error in results:
+            if error:
+                # Keep the previous rows and manifest entry so the file is retried next run
+                errors.append((file_path, error))
+                continue
+            
+            # Replace this file's rows (its old rows are never in the pending batch)
+            file_name = os.path.basename(file_path)
+            if file_name in manifest:
+                delete_file_rows(cursor, file_name)
+            cursor.execute('INSERT OR REPLACE INTO source_files (file_name, mtime_ns, size, sha256) VALUES (?, ?, ?, ?)',
+                           (file_name, *file_stats[file_name]))
+            
+            pending_agreements.extend(agreement_rows)
+            pending_compiled.extend(compiled_rows)
+            if len(pending_agreements) >= batch_size:
+                flush()
+    finally:
+        if executor:
+            executor.shutdown(cancel_futures=True)
+    
+    flush()
+    cursor.execute('''
+        INSERT INTO agreements_fts (rowid, major_name, sending_name, receiving_name)
+        SELECT id, major_norm, sending_name, receiving_name FROM agreements WHERE id > ?
+    ''', (last_id_before,))
+    create_indexes(cursor)
+    major_count = build_major_trigram_index(cursor)
+    catalog_changed = build_catalog(cursor)
+    alias_count = build_institution_aliases(cursor)
+    cursor.execute(f'PRAGMA user_version = {INDEX_SCHEMA_VERSION}')
+    
+    # Everything above runs in a single transaction
     conn.commit()
     conn.close()
-    print(f"Indexing complete! Indexed {count} agreements.")
+    
+    elapsed = time.perf_counter() - start_time
+    rows_per_sec = count / elapsed if elapsed > 0 else 0
+    print(f"Indexing complete! Indexed {count} agreements, compiled {compiled_count} majors "
+          f"in {elapsed:.2f}s ({rows_per_sec:,.0f} rows/sec).")
+    print(f"Built the fuzzy match index over {major_count} distinct majors "
+          f"and {alias_count} institution aliases.")
+    print("Institution/major catalogs " + ("updated." if catalog_changed else "unchanged."))
+    if touched:
+        print(f"{touched} file(s) had a new mtime but identical contents and were not reparsed.")
+    
+    if errors:
+        print(f"{len(errors)} file(s) could not be parsed:")
+        for file_path, error in errors:
+            print(f"  {file_path}: {error}")
 
 if __name__ == "__main__":
-    index_files()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Index ASSIST agreement files into SQLite")
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE,
+                        help=f"rows per executemany batch (default {BATCH_SIZE})")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="number of processes parsing files in parallel (default 1)")
+    parser.add_argument('--full', action='store_true',
+                        help="rebuild everything instead of reparsing only new or changed files")
+    args = parser.parse_args()
+    index_files(batch_size=args.batch_size, workers=max(1, args.workers), full=args.full)
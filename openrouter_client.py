@@ -0,0 +1,434 @@
+"""
+Shared HTTP client for OpenRouter chat completions: one pooled keep-alive session,
+connect/read timeouts, a cap on concurrent upstream calls, and exponential-backoff
+retries on 429/5xx and on connections that never reached the server. Point base_url at a local stub server to test without the real API;
+`python openrouter_client.py` runs a self-check against a built-in stub.
+"""
+import json
+import random
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import MaxRetryError, NewConnectionError
+
+# Set to False to silence the [DEBUG] retry output
+DEBUG = True
+
+def _debug(message):
+    if DEBUG:
+        print(f"[DEBUG] {message}")
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, float('inf'))
+
+# Upstream statuses worth retrying
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+class OpenRouterError(Exception):
+    """An OpenRouter call failed after retries (status_code is None for network errors)"""
+
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        self.status_code = status_code
+
+def _failed_to_connect(error):
+    """
+    True if a requests exception means the request never reached the server, so sending it
+    again can't repeat (and bill) work the model already did. Read timeouts and connections
+    dropped mid-response are not retried.
+    """
+    if isinstance(error, requests.ConnectTimeout):
+        return True
+    reason = error.args[0] if error.args else None
+    if isinstance(reason, MaxRetryError):
+        reason = reason.reason
+    return isinstance(reason, NewConnectionError)
+
+class LatencyHistogram:
+    """Cumulative-bucket histogram of call latencies, safe to share between threads"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self._counts = [0] * len(buckets)
+        self._count = 0
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        with self._lock:
+            self._count += 1
+            self._sum += seconds
+            for i, upper in enumerate(self.buckets):
+                if seconds <= upper:
+                    self._counts[i] += 1
+                    break
+
+    def snapshot(self):
+        with self._lock:
+            cumulative = 0
+            buckets = {}
+            for upper, count in zip(self.buckets, self._counts):
+                cumulative += count
+                buckets['+Inf' if upper == float('inf') else str(upper)] = cumulative
+            return {
+                'count': self._count,
+                'sum_seconds': round(self._sum, 3),
+                'buckets': buckets
+            }
+
+class StreamingResponse:
+    """
+    A streamed chat completion that keeps its concurrency slot until it is closed.
+    iter_lines() closes it when the body is exhausted; close() is safe to call more than once.
+    Other attributes (status_code, headers, ...) come from the underlying requests.Response.
+    """
+
+    def __init__(self, response, on_close):
+        self._response = response
+        self._on_close = on_close
+        self._closed = False
+        self._close_lock = threading.Lock()
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return getattr(self._response, name)
+
+    def iter_lines(self, *args, **kwargs):
+        try:
+            yield from self._response.iter_lines(*args, **kwargs)
+        finally:
+            self.close()
+
+    def close(self):
+        with self._close_lock:
+            if self._closed:
+                return
+            self._closed = True
+        try:
+            self._response.close()
+        finally:
+            self._on_close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __del__(self):
+        # Last resort for a stream that was dropped without being closed
+        self.close()
+
+class OpenRouterClient:
+    """Pooled, retrying client for the OpenRouter chat completions endpoint"""
+
+    def __init__(self, base_url, api_key, connect_timeout=5.0, read_timeout=120.0,
+                 max_concurrency=8, max_retries=3, backoff_base=0.5, backoff_max=8.0,
+                 queue_timeout=30.0):
+        self.base_url = base_url.rstrip('/')
+        self.api_key = api_key
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.queue_timeout = queue_timeout
+
+        # Keep-alive connections are reused across requests; one per allowed concurrent call
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_concurrency)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers.update({
+            "Content-Type": "application/json",
+            "HTTP-Referer": "http://localhost:5000"
+        })
+
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._stats_lock = threading.Lock()
+        self.latency = LatencyHistogram()
+        self.calls = 0
+        self.retries = 0
+        self.failures = 0
+
+    def _backoff(self, attempt, response=None):
+        """Seconds to wait before retry number `attempt` (honors Retry-After when given)"""
+        if response is not None:
+            retry_after = response.headers.get('Retry-After')
+            if retry_after:
+                try:
+                    return min(self.backoff_max, max(0.0, float(retry_after)))
+                except ValueError:
+                    pass
+        # Exponential backoff with full jitter
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    @staticmethod
+    def _error_message(response):
+        try:
+            return response.json().get('error', {}).get('message', 'Unknown error')
+        except ValueError:
+            return f"HTTP {response.status_code}"
+
+    def chat_completion(self, payload, title, stream=False):
+        """
+        POST payload to /chat/completions and return the decoded JSON response.
+        With stream=True an open StreamingResponse is returned instead. It holds one of the
+        max_concurrency slots, and its latency is recorded, until the caller closes it or reads
+        it to the end. Raises OpenRouterError when the call still fails after retries.
+        """
+        headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "X-Title": title
+        }
+
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            raise OpenRouterError('Too many concurrent OpenRouter requests', status_code=503)
+
+        # A returned stream takes over releasing the slot
+        release = True
+        try:
+            with self._stats_lock:
+                self.calls += 1
+
+            for attempt in range(self.max_retries + 1):
+                start = time.perf_counter()
+                response = None
+                try:
+                    response = self.session.post(
+                        f"{self.base_url}/chat/completions",
+                        headers=headers,
+                        json=payload,
+                        timeout=self.timeout,
+                        stream=stream
+                    )
+                    error = None
+                except (requests.ConnectionError, requests.Timeout) as e:
+                    error = OpenRouterError(f"OpenRouter request failed: {e}")
+                    retryable = _failed_to_connect(e)
+
+                if response is not None and response.status_code == 200 and stream:
+                    release = False
+                    return StreamingResponse(response, lambda start=start: self._finish_stream(start))
+                self.latency.observe(time.perf_counter() - start)
+
+                if response is not None and response.status_code == 200:
+                    try:
+                        return response.json()
+                    except ValueError as e:
+                        # Truncated or non-JSON body; the call went through, so don't resend it
+                        error = OpenRouterError(f"Invalid JSON in OpenRouter response: {e}", status_code=502)
+                        retryable = False
+                elif response is not None:
+                    error = OpenRouterError(self._error_message(response), status_code=response.status_code)
+                    retryable = response.status_code in RETRY_STATUSES
+                    response.close()
+
+                if not retryable or attempt == self.max_retries:
+                    with self._stats_lock:
+                        self.failures += 1
+                    raise error
+
+                with self._stats_lock:
+                    self.retries += 1
+                delay = self._backoff(attempt, response)
+                _debug(f"OpenRouter call failed ({error}), retry {attempt + 1}/{self.max_retries} in {delay:.2f}s")
+                time.sleep(delay)
+        finally:
+            if release:
+                self._slots.release()
+
+    def _finish_stream(self, start):
+        """Called once when a StreamingResponse is closed"""
+        self.latency.observe(time.perf_counter() - start)
+        self._slots.release()
+
+    def stats(self):
+        with self._stats_lock:
+            counters = {
+                'calls': self.calls,
+                'retries': self.retries,
+                'failures': self.failures
+            }
+        counters['latency'] = self.latency.snapshot()
+        return counters
+
+def _start_stub_server():
+    """
+    Local stand-in for OpenRouter. The first path segment picks the behavior:
+    /flaky (429 then 503, then 200), /fail (always 500), /bad (400), /garbled (200 with a
+    non-JSON body), /slow (200 after 0.2s, tracking peak concurrency) and /stream (SSE chunks,
+    0.05s apart).
+    """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    state = {'flaky_calls': 0, 'in_flight': 0, 'peak': 0}
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def _json(self, status, body, headers=None):
+            data = json.dumps(body).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            try:
+                self.wfile.write(data)
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # the client gave up (e.g. a read timeout)
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            scenario = self.path.strip('/').split('/')[0]
+            completion = {'choices': [{'message': {'content': 'ok'}}]}
+            if scenario == 'flaky':
+                with lock:
+                    state['flaky_calls'] += 1
+                    call = state['flaky_calls']
+                if call == 1:
+                    return self._json(429, {'error': {'message': 'rate limited'}}, {'Retry-After': '0'})
+                if call == 2:
+                    return self._json(503, {'error': {'message': 'unavailable'}})
+                return self._json(200, completion)
+            if scenario == 'fail':
+                return self._json(500, {'error': {'message': 'upstream broke'}})
+            if scenario == 'bad':
+                return self._json(400, {'error': {'message': 'bad request'}})
+            if scenario == 'garbled':
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', '9')
+                self.end_headers()
+                self.wfile.write(b'{"choices')
+                return
+            if scenario == 'slow':
+                with lock:
+                    state['in_flight'] += 1
+                    state['peak'] = max(state['peak'], state['in_flight'])
+                time.sleep(0.2)
+                with lock:
+                    state['in_flight'] -= 1
+                return self._json(200, completion)
+            if scenario == 'stream':
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/event-stream')
+                self.end_headers()
+                try:
+                    for text in ('a', 'b', 'c'):
+                        chunk = {'choices': [{'delta': {'content': text}}]}
+                        self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode('utf-8'))
+                        self.wfile.flush()
+                        time.sleep(0.05)
+                    self.wfile.write(b"data: [DONE]\n\n")
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # the client closed the stream early
+                return
+            self._json(404, {'error': {'message': 'unknown scenario'}})
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, state
+
+def _self_check():
+    """Exercise retries, error handling and the concurrency cap against the stub server"""
+    import socket
+
+    server, state = _start_stub_server()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+
+    def client(scenario, **kwargs):
+        options = {'max_retries': 3, 'backoff_base': 0.01, 'backoff_max': 0.05}
+        options.update(kwargs)
+        return OpenRouterClient(f"{base}/{scenario}", 'test-key', **options)
+
+    # 429 and 503 are retried, then the call succeeds
+    flaky = client('flaky')
+    assert flaky.chat_completion({}, 'check')['choices'][0]['message']['content'] == 'ok'
+    assert flaky.stats()['retries'] == 2 and flaky.stats()['failures'] == 0
+    print("retry on 429/503: ok")
+
+    # 5xx on every attempt: max_retries retries, then OpenRouterError with the status
+    failing = client('fail')
+    try:
+        failing.chat_completion({}, 'check')
+        raise AssertionError('expected OpenRouterError')
+    except OpenRouterError as e:
+        assert e.status_code == 500 and failing.retries == 3 and failing.failures == 1
+    print("gives up after max_retries: ok")
+
+    # 4xx is not retried
+    bad = client('bad')
+    try:
+        bad.chat_completion({}, 'check')
+        raise AssertionError('expected OpenRouterError')
+    except OpenRouterError as e:
+        assert e.status_code == 400 and bad.retries == 0
+    print("no retry on 400: ok")
+
+    # A 200 with a broken body is an OpenRouterError, counted as a failure, not resent
+    garbled = client('garbled')
+    try:
+        garbled.chat_completion({}, 'check')
+        raise AssertionError('expected OpenRouterError')
+    except OpenRouterError:
+        assert garbled.retries == 0 and garbled.failures == 1
+    print("invalid JSON body: ok")
+
+    # A refused connection never reached the server, so it is retried
+    with socket.socket() as unused:
+        unused.bind(('127.0.0.1', 0))
+        closed_port = unused.getsockname()[1]
+    refused = OpenRouterClient(f"http://127.0.0.1:{closed_port}", 'test-key', max_retries=2,
+                               backoff_base=0.01, backoff_max=0.05)
+    try:
+        refused.chat_completion({}, 'check')
+        raise AssertionError('expected OpenRouterError')
+    except OpenRouterError:
+        assert refused.retries == 2 and refused.failures == 1
+    print("retry on refused connection: ok")
+
+    # Never more than max_concurrency calls in flight
+    slow = client('slow', max_concurrency=2)
+    threads = [threading.Thread(target=slow.chat_completion, args=({}, 'check')) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert state['peak'] == 2, state['peak']
+    print("concurrency cap: ok")
+
+    # A read timeout may mean the model already did the work: fail without resending
+    timing_out = client('slow', read_timeout=0.05)
+    try:
+        timing_out.chat_completion({}, 'check')
+        raise AssertionError('expected OpenRouterError')
+    except OpenRouterError:
+        assert timing_out.retries == 0 and timing_out.failures == 1
+    print("no retry on read timeout: ok")
+
+    # An open stream holds its slot until it is closed or read to the end
+    streaming = client('stream', max_concurrency=1, queue_timeout=0.1)
+    stream = streaming.chat_completion({}, 'check', stream=True)
+    try:
+        streaming.chat_completion({}, 'check', stream=True)
+        raise AssertionError('expected the second stream to wait for a slot')
+    except OpenRouterError as e:
+        assert e.status_code == 503
+    lines = [line for line in stream.iter_lines() if line]
+    assert lines[-1] == b'data: [DONE]' and len(lines) == 4
+    assert streaming.latency.snapshot()['sum_seconds'] >= 0.15
+    streaming.chat_completion({}, 'check', stream=True).close()
+    print("stream holds its slot until closed: ok")
+
+    server.shutdown()
+    print("All OpenRouter client checks passed.")
+
+if __name__ == "__main__":
+    DEBUG = False
+    _self_check()
@@ -1,26 +1,291 @@
 import sqlite3
+import re
+import unicodedata
 
 DB_NAME = "transfer_data.db"
+# Fuzzy major matching: minimum Dice similarity over trigrams, and how many
+# distinct majors / agreement rows a fuzzy search may return
+FUZZY_MIN_SCORE = 0.35
+FUZZY_MAX_MAJORS = 10
+FUZZY_MAX_RESULTS = 200
+
+# Degree designations that should not affect major matching
+# (e.g. "Computer Science, B.S." and "Computer Science BA" both index as "computer science").
+# Dotted codes are removed anywhere; undotted ones only at the end of the name, since
+# "as", "ma" and "ms" are also ordinary words ("English as a Second Language").
+_DEGREE_CODES = r'BSE|BFA|BARCH|BMUS|BSN|BS|BA|BM|AA-?T|AS-?T|AA|AS|MS|MA'
+DEGREE_SUFFIX_RE = re.compile(
+    r'(?:^|(?<=[\s,(/-]))'
+    r'(?:B\.S\.?E|B\.F\.?A|B\.ARCH|B\.MUS|B\.S\.?N|B\.S|B\.A|B\.M|'
+    r'A\.A\.?-?T|A\.S\.?-?T|A\.A|A\.S|M\.S|M\.A)\.?'
+    r'(?=$|[\s,;)/])',
+    re.IGNORECASE
+)
+TRAILING_DEGREE_RE = re.compile(
+    r'(?:[\s,;(/-]+(?:' + _DEGREE_CODES + r')\.?\)?)+[\s,;.]*$',
+    re.IGNORECASE
+)
+
+def normalize_major_name(major_name):
+    """Lowercase a major name, drop degree suffixes and punctuation (e.g. 'COMPUTER SCIENCE, B.S.' -> 'computer science')"""
+    if not major_name:
+        return ""
+    stripped = TRAILING_DEGREE_RE.sub('', DEGREE_SUFFIX_RE.sub(' ', major_name))
+    return ' '.join(re.findall(r'[a-z0-9]+', stripped.lower()))
+
+# Curated abbreviations and short names -> canonical institution name(s). An alias only takes
+# effect for an institution that is in the index; where ASSIST has used more than one name,
+# every name is listed. Generated aliases ("uc davis", "cal state long beach", "san jose state")
+# come from institution_aliases and need no entry here.
+INSTITUTION_ABBREVIATIONS = {
+    'berkeley': ['University of California, Berkeley'],
+    'ucb': ['University of California, Berkeley'],
+    'ucla': ['University of California, Los Angeles'],
+    'ucsd': ['University of California, San Diego'],
+    'uci': ['University of California, Irvine'],
+    'ucd': ['University of California, Davis'],
+    'ucsb': ['University of California, Santa Barbara'],
+    'ucr': ['University of California, Riverside'],
+    'ucsc': ['University of California, Santa Cruz'],
+    'ucm': ['University of California, Merced'],
+    'csulb': ['California State University, Long Beach'],
+    'long beach state': ['California State University, Long Beach'],
+    'csuf': ['California State University, Fullerton'],
+    'csun': ['California State University, Northridge'],
+    'csula': ['California State University, Los Angeles'],
+    'cal state la': ['California State University, Los Angeles'],
+    'csueb': ['California State University, East Bay'],
+    'csusb': ['California State University, San Bernardino'],
+    'csusm': ['California State University, San Marcos'],
+    'csudh': ['California State University, Dominguez Hills'],
+    'csub': ['California State University, Bakersfield'],
+    'csuci': ['California State University, Channel Islands'],
+    'csumb': ['California State University, Monterey Bay'],
+    'csus': ['California State University, Sacramento'],
+    'sac state': ['California State University, Sacramento'],
+    'fresno state': ['California State University, Fresno'],
+    'chico state': ['California State University, Chico'],
+    'stanislaus state': ['California State University, Stanislaus'],
+    'sjsu': ['San Jose State University'],
+    'sdsu': ['San Diego State University'],
+    'sfsu': ['San Francisco State University'],
+    'cal poly': ['California Polytechnic University, San Luis Obispo'],
+    'cal poly slo': ['California Polytechnic University, San Luis Obispo'],
+    'cal poly pomona': ['California State Polytechnic University, Pomona'],
+    'cpp': ['California State Polytechnic University, Pomona'],
+    'cal poly humboldt': ['California State Polytechnic University, Humboldt', 'Cal Poly Humboldt'],
+    'humboldt state': ['California State Polytechnic University, Humboldt', 'Cal Poly Humboldt'],
+    'usc': ['University of Southern California'],
+    'lmu': ['Loyola Marymount University'],
+}
+
+# Institution name prefixes with a common short form ("University of California, Davis" -> "uc davis")
+INSTITUTION_SYSTEM_PREFIXES = {
+    'university of california': ('uc',),
+    'california state university': ('csu', 'cal state'),
+}
+
+def normalize_institution_name(name):
+    """
+    Lowercase an institution name, drop accents and punctuation, matching how agreements_fts
+    tokenizes it (e.g. 'San José State University' -> 'san jose state university')
+    """
+    if not name:
+        return ""
+    stripped = unicodedata.normalize('NFKD', name).encode('ascii', 'ignore').decode('ascii')
+    return ' '.join(re.findall(r'[a-z0-9]+', stripped.lower()))
+
+def generated_institution_aliases(name):
+    """Aliases derived from an institution's own name: the normalized name and its common short forms"""
+    normalized = normalize_institution_name(name)
+    if not normalized:
+        return set()
+    aliases = {normalized}
+    if normalized.startswith('the '):
+        aliases.add(normalized[4:])
+    for full in list(aliases):
+        for prefix, short_forms in INSTITUTION_SYSTEM_PREFIXES.items():
+            if full.startswith(prefix + ' '):
+                campus = full[len(prefix) + 1:]
+                aliases.update(f"{short} {campus}" for short in short_forms)
+        # "San Jose State University" -> "san jose state"
+        if full.endswith(' state university'):
+            aliases.add(full[:-len(' university')])
+    return aliases
+
+def institution_alias_rows(institutions):
+    """
+    Rows (alias, kind, institution_id, name, source) for the institution_aliases table, from
+    (kind, institution_id, name) tuples. source is 'name' for generated aliases, 'curated' for
+    INSTITUTION_ABBREVIATIONS entries.
+    """
+    rows = set()
+    by_name = {}
+    for kind, institution_id, name in institutions:
+        if institution_id is None or not name:
+            continue
+        by_name.setdefault(normalize_institution_name(name), []).append((kind, institution_id, name))
+        for alias in generated_institution_aliases(name):
+            rows.add((alias, kind, institution_id, name, 'name'))
+
+    for alias, canonical_names in INSTITUTION_ABBREVIATIONS.items():
+        for canonical in canonical_names:
+            for kind, institution_id, name in by_name.get(normalize_institution_name(canonical), ()):
+                rows.add((alias, kind, institution_id, name, 'curated'))
+    return sorted(rows, key=lambda row: (row[1], row[0], row[2]))
+
+class InstitutionResolver:
+    """
+    Resolves free-text institution names ("UC Berkeley", "ucla", "cal state long beach",
+    "Stanford") to one institution id, built from institution_aliases rows.
+
+    Lookup order: the whole query as an alias; else the longest alias found as a run of
+    words inside the query (an n-gram lookup over the query's words); else the one
+    institution whose name contains every word of the query. Anything that matches more
+    than one institution is left unresolved.
+    """
+
+    def __init__(self, alias_rows):
+        # kind -> alias -> {institution_id: name}
+        self._aliases = {}
+        # kind -> word of an institution name -> {institution_id}
+        self._words = {}
+        self._names = {}
+        self._max_alias_words = 1
+        for alias, kind, institution_id, name, _ in alias_rows:
+            self._aliases.setdefault(kind, {}).setdefault(alias, {})[institution_id] = name
+            self._max_alias_words = max(self._max_alias_words, len(alias.split()))
+            self._names[(kind, institution_id)] = name
+            for word in normalize_institution_name(name).split():
+                self._words.setdefault(kind, {}).setdefault(word, set()).add(institution_id)
+
+    def __len__(self):
+        return sum(len(aliases) for aliases in self._aliases.values())
+
+    def resolve(self, query, kind='receiving'):
+        """Return (institution_id, canonical name) for query, or None if unknown or ambiguous"""
+        words = normalize_institution_name(query).split()
+        aliases = self._aliases.get(kind, {})
+        if not words:
+            return None
+
+        matches = aliases.get(' '.join(words))
+        if matches is None:
+            # Longest alias that appears as consecutive words of the query
+            for size in range(min(len(words), self._max_alias_words), 0, -1):
+                found = {}
+                for start in range(len(words) - size + 1):
+                    found.update(aliases.get(' '.join(words[start:start + size]), {}))
+                if found:
+                    matches = found
+                    break
+
+        if matches is None:
+            index = self._words.get(kind, {})
+            candidates = None
+            for word in words:
+                ids = index.get(word, set())
+                candidates = ids if candidates is None else candidates & ids
+                if not candidates:
+                    break
+            matches = {institution_id: self._names[(kind, institution_id)] for institution_id in candidates or ()}
+
+        if len(matches) != 1:
+            return None
+        return next(iter(matches.items()))
+
+def fts_major_query(major_query, university=None):
+    """
+    Build an FTS5 MATCH expression for agreements_fts: every word of the major as a prefix
+    term (single characters, like the "c" of "C++", only as whole words), optionally restricted
+    to a receiving institution phrase. Returns None if the major has no searchable words.
+    """
+    tokens = normalize_major_name(major_query).split()
+    if not tokens:
+        return None
+    
+    # Tokens are [a-z0-9]+ only, so quoting them is all the escaping FTS5 needs
+    terms = [f'"{token}"*' if len(token) >= 2 else f'"{token}"' for token in tokens]
+    expression = 'major_name : (' + ' AND '.join(terms) + ')'
+    if university:
+        university_phrase = normalize_institution_name(university)
+        if university_phrase:
+            expression += f' AND receiving_name : "{university_phrase}"'
+    return expression
+
+def major_trigrams(normalized_major):
+    """Character trigrams of each word, padded so word starts and ends count (e.g. 'sci' -> '  s', ' sc', 'sci', 'ci ')"""
+    trigrams = set()
+    for word in normalized_major.split():
+        padded = f"  {word} "
+        for i in range(len(padded) - 2):
+            trigrams.add(padded[i:i + 3])
+    return trigrams
+
+def has_table(cursor, table_name):
+    """True if the indexer has built table_name (older databases may lack the search tables)"""
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (table_name,))
+    return cursor.fetchone() is not None
+
+def fuzzy_major_matches(cursor, major_query, limit=FUZZY_MAX_MAJORS, min_score=FUZZY_MIN_SCORE):
+    """
+    Find indexed majors similar to major_query using the major_trigrams table.
+    Returns up to `limit` (major_norm, score) pairs, best first, where score is the
+    Dice coefficient of the two trigram sets (1.0 = identical).
+    """
+    query_trigrams = major_trigrams(normalize_major_name(major_query))
+    if not query_trigrams or not has_table(cursor, 'major_trigrams'):
+        return []
+    
+    placeholders = ','.join('?' * len(query_trigrams))
+    cursor.execute(f'''
+        SELECT t.major_norm, 2.0 * COUNT(*) / (? + t.trigram_count) AS score
+        FROM major_trigrams g
+        JOIN major_terms t ON t.id = g.term_id
+        WHERE g.trigram IN ({placeholders})
+        GROUP BY g.term_id
+        HAVING score >= ?
+        ORDER BY score DESC, t.major_norm
+        LIMIT ?
+    ''', [len(query_trigrams), *sorted(query_trigrams), min_score, limit])
+    return cursor.fetchall()
 
 def search_programs(user_major_query, source_college_id=None):
     conn = sqlite3.connect(DB_NAME)
     cursor = conn.cursor()
     
-    # SQL query with a LIKE clause for partial matching
-    # e.g., '%Computer%' finds "Computer Science", "Computer Engineering"
-    query = f"%{user_major_query}%"
-    
-    sql = '''
-        SELECT receiving_name, major_name, agreement_key
-        FROM agreements
-        WHERE major_name LIKE ?
-    '''
-    params = [query]
-
-    # If user selected a specific Community College, filter by it
-    if source_college_id:
-        sql += " AND sending_id = ?"
-        params.append(source_college_id)
+    match_expression = fts_major_query(user_major_query)
+    if match_expression and has_table(cursor, 'agreements_fts'):
+        # Full-text search, best matches first
+        sql = '''
+            SELECT a.receiving_name, a.major_name, a.agreement_key
+            FROM agreements_fts
+            JOIN agreements a ON a.id = agreements_fts.rowid
+            WHERE agreements_fts MATCH ?
+        '''
+        params = [match_expression]
+        
+        if source_college_id:
+            sql += " AND a.sending_id = ?"
+            params.append(source_college_id)
+        
+        sql += " ORDER BY bm25(agreements_fts)"
+    else:
+        # SQL query with a LIKE clause for partial matching
+        # e.g., '%Computer%' finds "Computer Science", "Computer Engineering"
+        query = f"%{user_major_query}%"
+        
+        sql = '''
+            SELECT receiving_name, major_name, agreement_key
+            FROM agreements
+            WHERE major_name LIKE ?
+        '''
+        params = [query]
+
+        # If user selected a specific Community College, filter by it
+        if source_college_id:
+            sql += " AND sending_id = ?"
+            params.append(source_college_id)
         
     cursor.execute(sql, params)
     results = cursor.fetchall()
@@ -28,12 +293,13 @@ def search_programs(user_major_query, source_college_id=None):
     
     return results
 
-# --- TEST THE SEARCH ---
-user_input = "Computer Science"
-my_cc_id = 110 # De Anza College
+if __name__ == "__main__":
+    # --- TEST THE SEARCH ---
+    user_input = "Computer Science"
+    my_cc_id = 110 # De Anza College
 
-matches = search_programs(user_input, my_cc_id)
+    matches = search_programs(user_input, my_cc_id)
 
-print(f"Found {len(matches)} matches for '{user_input}':")
-for uni, major, key in matches[:10]: # Print top 10
-    print(f"- {uni}: {major}")
\ No newline at end of file
+    print(f"Found {len(matches)} matches for '{user_input}':")
+    for uni, major, key in matches[:10]: # Print top 10
+        print(f"- {uni}: {major}")
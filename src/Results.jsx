@@ -1,4 +1,4 @@
-import React, { useEffect, useState } from 'react';
+import React, { useEffect, useRef, useState } from 'react';
 import { useLocation, useNavigate } from 'react-router-dom';
 import './index.css';
 
@@ -30,6 +30,7 @@ function Results() {
   const [selectedAgreementIdx, setSelectedAgreementIdx] = useState(0);
   const [recommendations, setRecommendations] = useState('');
   const [loadingRecs, setLoadingRecs] = useState(false);
+  const recsAbortRef = useRef(null);
   const [recsError, setRecsError] = useState('');
 
   // Calculate actual progress from the first agreement
@@ -79,17 +80,20 @@ function Results() {
 
   const gpaData = calculateGPA(studentCourses);
 
-  // Fetch AI recommendations
+  // Fetch AI recommendations, showing the text as it streams in
   const fetchRecommendations = async () => {
     if (!primaryAgreement || loadingRecs || recommendations) return;
     
     setLoadingRecs(true);
     setRecsError('');
+    const controller = new AbortController();
+    recsAbortRef.current = controller;
     
     try {
-      const response = await fetch('http://localhost:5000/api/generate-recommendations', {
+      const response = await fetch('http://localhost:5000/api/generate-recommendations/stream', {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
+        signal: controller.signal,
         body: JSON.stringify({
           student_courses: studentCourses || [],
           completed_requirements: comparison.completed_required || [],
@@ -102,18 +106,49 @@ function Results() {
         })
       });
       
-      const data = await response.json();
-      if (data.success && data.recommendations) {
-        setRecommendations(data.recommendations);
-      } else {
+      if (!response.ok || !response.body) {
+        const data = await response.json().catch(() => ({}));
         setRecsError(data.error || 'Failed to generate recommendations');
+        return;
+      }
+      
+      // Server-sent events: "event: <name>\ndata: <json>\n\n"
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = '';
+      let text = '';
+      while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        const events = buffer.split('\n\n');
+        buffer = events.pop();
+        
+        for (const raw of events) {
+          const event = raw.match(/^event: (.*)$/m)?.[1];
+          const data = JSON.parse(raw.match(/^data: (.*)$/m)?.[1] || '{}');
+          if (event === 'token') {
+            text += data.text;
+            setRecommendations(text);
+          } else if (event === 'done') {
+            setRecommendations(data.recommendations || text);
+          } else if (event === 'error') {
+            setRecommendations('');
+            setRecsError(data.error || 'Failed to generate recommendations');
+          }
+        }
       }
     } catch (err) {
-      setRecsError('Could not connect to AI advisor');
+      if (err.name !== 'AbortError') {
+        setRecsError('Could not connect to AI advisor');
+      }
     } finally {
       setLoadingRecs(false);
     }
   };
+  
+  // Stop a generation that is still streaming when leaving the page
+  useEffect(() => () => recsAbortRef.current?.abort(), []);
 
   // If no results data, redirect to home
   useEffect(() => {
@@ -486,7 +521,7 @@ function Results() {
               </div>
               
               <div className="overflow-y-auto flex-1">
-                {loadingRecs ? (
+                {loadingRecs && !recommendations ? (
                   <div className="flex items-center justify-center py-6">
                     <div className="w-6 h-6 border-2 border-gray-200 rounded-full animate-spin border-t-indigo-600"></div>
                     <span className="ml-2 text-sm text-gray-500">Loading...</span>
@@ -558,9 +593,9 @@ function Results() {
             >
               Analyze Another Transcript
             </button>
-            {primaryAgreement?.agreement_data?.assist_url && (
+            {primaryAgreement?.assist_url && (
               <a
-                href={primaryAgreement.agreement_data.assist_url}
+                href={primaryAgreement.assist_url}
                 target="_blank"
                 rel="noopener noreferrer"
                 className="px-8 py-4 rounded-2xl font-bold text-white bg-gradient-to-r from-emerald-500 to-teal-600 hover:from-emerald-600 hover:to-teal-700 shadow-lg hover:shadow-xl transform hover:-translate-y-1 active:translate-y-0 transition-all duration-200 text-center flex items-center justify-center gap-2 animate-bounce-in"
@@ -0,0 +1,296 @@
+"""
+Rule-based transcript parsing for uploads that carry text: CSV, plain text, and PDFs with
+a text layer (read with pypdf when it is installed). Produces the same {'college_name', 'courses'}
+shape as the model extraction, plus a confidence score so the caller can fall back to the
+model when parsing looks unreliable.
+"""
+import csv
+import io
+import re
+
+try:
+    from pypdf import PdfReader
+except ImportError:
+    PdfReader = None
+
+# Course codes such as "MATH 1A", "CS-31", "ENGL1A" or "BIO SCI 93": a 2-7 letter subject
+# (optionally two words) followed by a number with an optional letter suffix.
+# Formatted as "SUBJECT NUMBER", they normalize the same way as ASSIST codes (normalize_course_code).
+COURSE_CODE_RE = re.compile(r'\b([A-Z][A-Z&]{1,6}(?: [A-Z]{1,4})?)[ \t-]?(\d{1,4}[A-Z]{0,3})\b')
+COURSE_CODE_FULL_RE = re.compile(r'^\s*([A-Za-z][A-Za-z&]{1,6}(?: [A-Za-z]{1,4})?)[ \t-]?(\d{1,4}[A-Za-z]{0,3})\s*$')
+
+# Words that look like a subject in front of a number but are not course codes
+NON_SUBJECT_WORDS = {
+    'FALL', 'SPRING', 'SUMMER', 'WINTER', 'TERM', 'YEAR', 'PAGE', 'GPA', 'ID',
+    'UNITS', 'TOTAL', 'CREDITS', 'HOURS', 'DATE', 'ZIP', 'PHONE', 'STUDENT', 'SEMESTER', 'QUARTER'
+}
+
+GRADES = {
+    'A+', 'A', 'A-', 'B+', 'B', 'B-', 'C+', 'C', 'C-', 'D+', 'D', 'D-', 'F',
+    'P', 'NP', 'CR', 'NC', 'W', 'I', 'IP', 'RD', 'EW', 'MW'
+}
+# Grades that mean the course was not (or not yet) passed
+NOT_COMPLETED_GRADES = {'F', 'NP', 'NC', 'W', 'I', 'IP', 'RD', 'EW', 'MW'}
+
+CREDITS_RE = re.compile(r'^\d{1,2}(?:\.\d{1,2})?$')
+COLLEGE_LINE_RE = re.compile(r'\b(college|university|institute|school)\b', re.IGNORECASE)
+
+# Header names recognized for each CSV column (compared after lowercasing and collapsing punctuation)
+HEADER_ALIASES = {
+    'code': {'course code', 'course', 'code', 'course id', 'class', 'course no', 'course num'},
+    'subject': {'subject', 'subject code', 'dept', 'department', 'prefix'},
+    'number': {'number', 'catalog', 'catalog number', 'catalog nbr', 'course number', 'num', 'no'},
+    'name': {'course name', 'course title', 'title', 'name', 'description', 'descr'},
+    'credits': {'credits', 'credit', 'units', 'unit', 'hours', 'credit hours', 'units attempted', 'units earned', 'cr', 'hrs'},
+    'grade': {'grade', 'final grade', 'mark', 'grd'},
+    'college': {'college', 'college name', 'institution', 'school'},
+}
+
+# Bump whenever parsing output changes; cached extractions are keyed on it
+PARSER_VERSION = 1
+
+# Below this many courses a parse is never considered confident
+MIN_COURSES = 3
+
+# PDFs with more pages than this are left to the model
+PDF_MAX_PAGES = 30
+
+def format_course_code(subject, number):
+    """Canonical "SUBJECT NUMBER" form of a parsed course code"""
+    return f"{' '.join(subject.upper().split())} {number.upper()}"
+
+def match_course_code(text):
+    """Return the canonical course code if text is exactly one course code, else None"""
+    match = COURSE_CODE_FULL_RE.match(text or '')
+    if not match or match.group(1).split()[0].upper() in NON_SUBJECT_WORDS:
+        return None
+    return format_course_code(match.group(1), match.group(2))
+
+def parse_credits(value):
+    value = (value or '').strip()
+    if not CREDITS_RE.match(value):
+        return None
+    credits = float(value)
+    return int(credits) if credits.is_integer() else credits
+
+def make_course(course_code, course_name='', credits=None, grade=''):
+    grade = (grade or '').strip().upper()
+    return {
+        'course_code': course_code,
+        'course_name': course_name.strip(),
+        'credits': credits if credits is not None else 0,
+        'grade': grade,
+        'completed': bool(grade) and grade not in NOT_COMPLETED_GRADES
+    }
+
+def _confidence(parsed, candidates):
+    """Share of candidate rows that parsed, capped low when there are too few courses to trust"""
+    if not candidates or not parsed:
+        return 0.0
+    score = parsed / candidates
+    if parsed < MIN_COURSES:
+        score = min(score, 0.3)
+    return round(score, 3)
+
+def _header_role(cell):
+    key = ' '.join(re.sub(r'[^a-z0-9]+', ' ', cell.lower()).split())
+    for role, aliases in HEADER_ALIASES.items():
+        if key in aliases:
+            return role
+    return None
+
+def _sniff_columns(rows):
+    """Guess column roles from cell contents when there is no recognizable header"""
+    width = max(len(row) for row in rows)
+    roles = {}
+
+    def share(col, predicate):
+        values = [row[col].strip() for row in rows if col < len(row) and row[col].strip()]
+        return (sum(1 for v in values if predicate(v)) / len(values)) if values else 0.0
+
+    scores = {col: share(col, lambda v: match_course_code(v) is not None) for col in range(width)}
+    best = max(scores, key=scores.get)
+    if scores[best] >= 0.6:
+        roles['code'] = best
+
+    for role, predicate, threshold in (
+        ('grade', lambda v: v.upper() in GRADES, 0.6),
+        ('credits', lambda v: parse_credits(v) is not None, 0.8),
+    ):
+        candidates = [col for col in range(width) if col not in roles.values()]
+        scored = {col: share(col, predicate) for col in candidates}
+        if scored:
+            col = max(scored, key=scored.get)
+            if scored[col] >= threshold:
+                roles[role] = col
+
+    # The title is the remaining column with the longest text
+    remaining = [col for col in range(width) if col not in roles.values()]
+    if remaining:
+        roles['name'] = max(remaining, key=lambda col: sum(len(row[col]) for row in rows if col < len(row)))
+    return roles
+
+def parse_csv_transcript(text):
+    """Parse a CSV/TSV transcript; returns ({'college_name', 'courses'}, confidence)"""
+    sample = text[:8192]
+    try:
+        dialect = csv.Sniffer().sniff(sample, delimiters=',;\t|')
+    except csv.Error:
+        dialect = csv.excel
+    rows = [row for row in csv.reader(io.StringIO(text), dialect) if any(cell.strip() for cell in row)]
+    if not rows:
+        return {'college_name': '', 'courses': []}, 0.0
+
+    header_roles = {}
+    for col, cell in enumerate(rows[0]):
+        role = _header_role(cell)
+        if role and role not in header_roles:
+            header_roles[role] = col
+
+    if 'code' in header_roles or ('subject' in header_roles and 'number' in header_roles):
+        roles, data_rows = header_roles, rows[1:]
+    else:
+        data_rows = rows[1:] if header_roles else rows
+        if not data_rows:
+            return {'college_name': '', 'courses': []}, 0.0
+        roles = _sniff_columns(data_rows[:50])
+        if 'code' not in roles:
+            return {'college_name': '', 'courses': []}, 0.0
+
+    def cell(row, role):
+        col = roles.get(role)
+        return row[col] if col is not None and col < len(row) else ''
+
+    courses = []
+    college_name = ''
+    for row in data_rows:
+        if 'code' in roles:
+            course_code = match_course_code(cell(row, 'code'))
+        else:
+            course_code = match_course_code(f"{cell(row, 'subject')} {cell(row, 'number')}")
+        if not college_name and cell(row, 'college').strip():
+            college_name = cell(row, 'college').strip()
+        if not course_code:
+            continue
+        grade = cell(row, 'grade').strip().upper()
+        courses.append(make_course(
+            course_code,
+            cell(row, 'name'),
+            parse_credits(cell(row, 'credits')),
+            grade if grade in GRADES else ''
+        ))
+
+    return {'college_name': college_name, 'courses': courses}, _confidence(len(courses), len(data_rows))
+
+def _find_course_code(line):
+    """First course code in a line, skipping matches that start with a word like FALL or UNITS"""
+    pos = 0
+    while True:
+        match = COURSE_CODE_RE.search(line, pos)
+        if not match:
+            return None
+        first_word = match.group(1).split()[0]
+        if first_word not in NON_SUBJECT_WORDS:
+            return match
+        pos = match.start() + len(first_word)
+
+def parse_text_line(line):
+    """Parse one plain-text transcript line into a course dict, or None if it isn't a course row"""
+    match = _find_course_code(line)
+    if not match:
+        return None
+
+    # Grade and credit columns trail the title: "MATH 1A  Calculus I  5.00  A"
+    tokens = line[match.end():].split()
+    grade = ''
+    numbers = []
+    while tokens:
+        token = tokens[-1]
+        if not grade and token.upper() in GRADES:
+            grade = token.upper()
+        elif CREDITS_RE.match(token):
+            numbers.append(token)
+        else:
+            break
+        tokens.pop()
+
+    # Without a units column a trailing "I" is more likely a title ("Calculus I") than an Incomplete
+    if not numbers and grade in ('', 'I'):
+        return None
+
+    # With several numbers (units attempted/earned, grade points) the leftmost is the units
+    credits = parse_credits(numbers[-1]) if numbers else None
+    return make_course(format_course_code(match.group(1), match.group(2)), ' '.join(tokens), credits, grade)
+
+def find_college_name(lines):
+    """The first line near the top that names an institution"""
+    for line in lines[:15]:
+        line = line.strip()
+        if COLLEGE_LINE_RE.search(line) and not _find_course_code(line) and len(line) <= 100:
+            return line
+    return ''
+
+def course_code_lines(lines):
+    """Lines that mention a course code"""
+    return [line for line in lines if _find_course_code(line)]
+
+def parse_text_transcript(text):
+    """Parse a plain-text transcript; returns ({'college_name', 'courses'}, confidence)"""
+    lines = [line for line in text.splitlines() if line.strip()]
+    candidates = course_code_lines(lines)
+    courses = [course for course in map(parse_text_line, candidates) if course]
+    return {'college_name': find_college_name(lines), 'courses': courses}, _confidence(len(courses), len(candidates))
+
+def extract_pdf_text(file_content):
+    """
+    Return the text layer of a PDF, or None if pypdf is not installed, the PDF can't be read,
+    or it is too long. Scanned (image-only) PDFs come back as little or no text.
+    """
+    if PdfReader is None:
+        return None
+    try:
+        reader = PdfReader(io.BytesIO(file_content))
+        if len(reader.pages) > PDF_MAX_PAGES:
+            return None
+        return '\n'.join(page.extract_text() or '' for page in reader.pages)
+    except Exception:
+        return None
+
+def decode_text(file_content):
+    """Decode uploaded bytes as text, or None if they look binary"""
+    if b'\x00' in file_content[:4096]:
+        return None
+    try:
+        return file_content.decode('utf-8-sig')
+    except UnicodeDecodeError:
+        return file_content.decode('latin-1')
+
+def parse_transcript(file_content, file_name):
+    """
+    Parse a .csv/.tsv/.txt upload, or a PDF's text layer, locally.
+    Returns ({'college_name', 'courses'}, confidence between 0 and 1, text the parse was based on),
+    or None when there is no usable text: other file types, or PDFs without a text layer
+    listing at least MIN_COURSES course codes (e.g. scans).
+    """
+    name = (file_name or '').lower()
+    if name.endswith('.pdf') or file_content[:5] == b'%PDF-':
+        text = extract_pdf_text(file_content)
+        if not text or len(course_code_lines(text.splitlines())) < MIN_COURSES:
+            return None
+        return (*parse_text_transcript(text), text)
+
+    if not name.endswith(('.csv', '.tsv', '.txt')):
+        return None
+    text = decode_text(file_content)
+    if text is None:
+        return None
+    if name.endswith(('.csv', '.tsv')):
+        return (*parse_csv_transcript(text), text)
+
+    # Plain text may still be delimited; keep whichever reading is more convincing
+    extraction, confidence = parse_text_transcript(text)
+    if confidence < 1.0 and any(d in text[:2048] for d in ',\t'):
+        csv_extraction, csv_confidence = parse_csv_transcript(text)
+        if csv_confidence > confidence:
+            return csv_extraction, csv_confidence, text
+    return extraction, confidence, text